@@ -0,0 +1,252 @@
+#!/usr/bin/env python3
+"""
+Offline generation through a provider batch API (OpenAI /v1/batches format).
+
+build: stream example JSONL files into batch request files. Each distinct
+request (same normalization as main()'s dedup) becomes one line whose
+custom_id is a hash of the request, so it is stable across runs and files.
+The response_format.json schema is attached to every body, and a new file is
+started before one would pass --max-requests lines or --max-mb megabytes.
+
+reconcile: stream batch output/error files back and join them to the source
+examples by custom_id. Both sides are spilled into hash partitions and joined
+one partition at a time, so memory holds one partition of results; the
+partition count is sized from the result files and --memory-mb. --mode
+merge writes complete training examples for schema-valid plans; --mode grade
+writes one grading row per source request (schema errors, section and
+question counts, or the batch error).
+
+simulate: write result files for request files with the local stub, to
+exercise reconcile without a provider.
+
+Usage:
+    python batch_requests.py build eval_data_rft.jsonl rft_training_data_final.jsonl -o batch/requests
+    python batch_requests.py simulate batch/requests-0001.jsonl -o batch/results-0001.jsonl --invalid-rate 0.1
+    python batch_requests.py reconcile --sources eval_data_rft.jsonl rft_training_data_final.jsonl \
+        --results batch/results-*.jsonl --mode grade -o graded.jsonl
+"""
+import argparse
+import hashlib
+import json
+import os
+import shutil
+import tempfile
+
+from build_preference_pairs import spill
+from canonicalize_prompts import request_text
+from checkpoint import atomic_write
+from generate_merged_training import get_user_message, make_complete, make_prompt_only, read_jsonl
+from openai_compat import DEFAULT_MODEL, chat_completion_body
+from plan_schema import load_plan_schema, load_response_format, parse_plan
+from shuffle_jsonl import bucket_count, max_fanout
+
+BATCH_URL = "/v1/chat/completions"
+MAX_REQUESTS = 50000
+MAX_MB = 190.0
+DEFAULT_PARTITIONS = 16
+
+
+def custom_id(request):
+    """Stable batch id for a request, normalized like main()'s dedup key."""
+    return "plan-" + hashlib.sha1(request.strip().lower().encode("utf-8")).hexdigest()[:32]
+
+
+def iter_requests(paths):
+    """(custom_id, request, source path, line number) for every example with a request."""
+    for path in paths:
+        for line_number, example in enumerate(read_jsonl(path), 1):
+            request = request_text(get_user_message(example))
+            if request:
+                yield custom_id(request), request, path, line_number
+
+
+class BatchFileWriter:
+    """Writes request lines into numbered files, rolling over on count or size."""
+
+    def __init__(self, prefix, max_requests=MAX_REQUESTS, max_bytes=int(MAX_MB * 1024 * 1024)):
+        self.prefix = prefix
+        self.max_requests = max_requests
+        self.max_bytes = max_bytes
+        self.paths = []
+        self.file = None
+        self.count = 0
+        self.size = 0
+
+    def write(self, line):
+        data = line.encode("utf-8")
+        if self.file is None or self.count >= self.max_requests or self.size + len(data) > self.max_bytes:
+            self._roll()
+        self.file.write(data)
+        self.count += 1
+        self.size += len(data)
+
+    def _roll(self):
+        self.close()
+        self.paths.append(f"{self.prefix}-{len(self.paths) + 1:04d}.jsonl")
+        self.file = open(self.paths[-1], "wb")
+        self.count = self.size = 0
+
+    def close(self):
+        if self.file is not None:
+            self.file.close()
+            self.file = None
+
+
+def build(paths, prefix, model, max_requests, max_mb, **params):
+    """Write batch request files; returns (paths, requests written, duplicates skipped)."""
+    response_format = load_response_format()
+    os.makedirs(os.path.dirname(os.path.abspath(prefix)), exist_ok=True)
+    writer = BatchFileWriter(prefix, max_requests, int(max_mb * 1024 * 1024))
+    seen = set()
+    written = duplicates = 0
+    try:
+        for cid, request, _, _ in iter_requests(paths):
+            if cid in seen:
+                duplicates += 1
+                continue
+            seen.add(cid)
+            body = chat_completion_body(make_prompt_only(request)["messages"], model, response_format, **params)
+            writer.write(json.dumps({"custom_id": cid, "method": "POST", "url": BATCH_URL, "body": body},
+                                    ensure_ascii=False) + "\n")
+            written += 1
+    finally:
+        writer.close()
+    return writer.paths, written, duplicates
+
+
+def compact_result(line):
+    """(custom_id, {"content"| "error"}) from one batch output or error line."""
+    result = json.loads(line)
+    response = result.get("response") or {}
+    status = response.get("status_code") or 200
+    if result.get("error") or status >= 400:
+        body = response.get("body")
+        error = result.get("error") or (body.get("error") if isinstance(body, dict) else body)
+        message = error.get("message") if isinstance(error, dict) else error
+        return result["custom_id"], {"error": str(message) if message else f"HTTP {status}"}
+    try:
+        content = response["body"]["choices"][0]["message"]["content"]
+    except (KeyError, IndexError, TypeError):
+        return result["custom_id"], {"error": "response without message content"}
+    return result["custom_id"], {"content": content}
+
+
+def iter_results(paths):
+    for path in paths:
+        with open(path, "r", encoding="utf-8") as f:
+            for line in f:
+                if line.strip():
+                    yield compact_result(line)
+
+
+def grade(request, result, schema):
+    """(grading row, plan) for a request and its compacted batch result (None when missing)."""
+    row = {"request": request}
+    if result is None:
+        return dict(row, status="missing"), None
+    if "error" in result:
+        return dict(row, status="error", error=result["error"]), None
+    plan, errors = parse_plan(result["content"], schema)
+    if errors:
+        return dict(row, status="invalid", errors=errors[:5]), None
+    sections = plan["researchPlan"]["sections"]
+    return dict(row, status="ok", title=plan["researchPlan"]["title"], sections=len(sections),
+                questions=sum(len(s["questions"]) for s in sections)), plan
+
+
+def reconcile(source_paths, result_paths, output_path, mode, partitions=DEFAULT_PARTITIONS, tmp_dir=None):
+    """Join results to their source requests partition by partition; returns status counts.
+
+    spill() holds every partition file open, so partitions is capped at
+    max_fanout(); the count used is returned as stats["partitions"].
+    """
+    schema = load_plan_schema()
+    partitions = min(partitions, max_fanout())
+    stats = {"partitions": partitions}
+    work_dir = tempfile.mkdtemp(prefix="batch-", dir=tmp_dir or os.path.dirname(os.path.abspath(output_path)))
+    try:
+        spill(((cid, [cid, result]) for cid, result in iter_results(result_paths)), work_dir, "results", partitions)
+        spill(((cid, [cid, request, path, line]) for cid, request, path, line in iter_requests(source_paths)),
+              work_dir, "sources", partitions)
+        with atomic_write(output_path) as out:
+            for i in range(partitions):
+                results = {}
+                for cid, result in read_jsonl(os.path.join(work_dir, f"results-{i:04d}")):
+                    if "content" in result or cid not in results:
+                        results[cid] = result  # a success wins over an error for the same request
+                emitted = set()
+                for cid, request, path, line in read_jsonl(os.path.join(work_dir, f"sources-{i:04d}")):
+                    if cid in emitted:
+                        continue
+                    emitted.add(cid)
+                    row, plan = grade(request, results.pop(cid, None), schema)
+                    stats[row["status"]] = stats.get(row["status"], 0) + 1
+                    if mode == "grade":
+                        record = dict(row, custom_id=cid, source=path, line=line)
+                    elif plan is not None:
+                        record = make_complete(request, plan["chatResponse"], plan["researchPlan"]["title"],
+                                               plan["researchPlan"]["sections"])
+                    else:
+                        continue
+                    out.write(json.dumps(record, ensure_ascii=False) + "\n")
+                stats["unmatched"] = stats.get("unmatched", 0) + len(results)
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+    return stats
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Build batch request files and reconcile their results.")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    build_cmd = commands.add_parser("build", help="write batch request files")
+    build_cmd.add_argument("inputs", nargs="+", help="example JSONL files")
+    build_cmd.add_argument("-o", "--output-prefix", required=True, help="files are written as PREFIX-0001.jsonl, ...")
+    build_cmd.add_argument("--model", default=DEFAULT_MODEL)
+    build_cmd.add_argument("--temperature", type=float, default=None)
+    build_cmd.add_argument("--max-requests", type=int, default=MAX_REQUESTS, help="requests per file")
+    build_cmd.add_argument("--max-mb", type=float, default=MAX_MB, help="size limit per file")
+
+    simulate_cmd = commands.add_parser("simulate", help="answer a request file with the local stub")
+    simulate_cmd.add_argument("requests")
+    simulate_cmd.add_argument("-o", "--output", required=True)
+    simulate_cmd.add_argument("--errors", default=None, help="write failed requests here, like the error file")
+    simulate_cmd.add_argument("--error-rate", type=float, default=0.0)
+    simulate_cmd.add_argument("--invalid-rate", type=float, default=0.0)
+    simulate_cmd.add_argument("--seed", type=int, default=0)
+
+    reconcile_cmd = commands.add_parser("reconcile", help="join result files back to their sources")
+    reconcile_cmd.add_argument("--sources", nargs="+", required=True, help="the example JSONL files given to build")
+    reconcile_cmd.add_argument("--results", nargs="+", required=True, help="batch output and error files")
+    reconcile_cmd.add_argument("--mode", choices=("merge", "grade"), default="grade")
+    reconcile_cmd.add_argument("-o", "--output", required=True)
+    reconcile_cmd.add_argument("--memory-mb", type=float, default=256.0, help="memory budget for one partition of results")
+    reconcile_cmd.add_argument("--partitions", type=int, default=0, help="override the partition count")
+    args = parser.parse_args()
+
+    if args.command == "build":
+        params = {} if args.temperature is None else {"temperature": args.temperature}
+        paths, written, duplicates = build(args.inputs, args.output_prefix, args.model, args.max_requests,
+                                           args.max_mb, **params)
+        print(f"Wrote {written} requests into {len(paths)} files ({duplicates} duplicate requests skipped)")
+        for path in paths:
+            print(f"  - {path}")
+    elif args.command == "simulate":
+        from stub_llm_server import stub_batch_results
+
+        counts = stub_batch_results(args.requests, args.output, args.errors, args.error_rate, args.invalid_rate,
+                                    args.seed)
+        print(f"Wrote {counts['output']} results to {args.output} ({counts['errors']} errors)")
+    else:
+        partitions = args.partitions or bucket_count(sum(os.path.getsize(path) for path in args.results),
+                                                     int(args.memory_mb * 1024 * 1024))
+        stats = reconcile(args.sources, args.results, args.output, args.mode, partitions)
+        print(f"Reconciled into {args.output} ({args.mode}, {stats['partitions']} partitions)")
+        if stats["partitions"] < partitions:
+            print(f"  note: capped at {stats['partitions']} open partition files; partitions exceed --memory-mb")
+        for status in ("ok", "invalid", "error", "missing", "unmatched"):
+            print(f"  - {status}: {stats.get(status, 0)}")
+
+
+if __name__ == "__main__":
+    main()
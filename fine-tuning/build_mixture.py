@@ -0,0 +1,138 @@
+#!/usr/bin/env python3
+"""
+Build a weighted training mixture from several source JSONL files.
+
+Each source gets a target count, either directly (--targets) or from
+weights over a total (--weights, --total). Sources are streamed, never
+loaded: a source with N records and target T is read in full T // N times,
+then once more emitting only T % N records chosen by selection sampling
+(Knuth's Algorithm S), so the copies of an upsampled record are a whole pass
+apart instead of adjacent. Sources are interleaved by stride
+scheduling, so at any point of the output every source has contributed in
+proportion to its target. Everything is deterministic for a given seed.
+
+Usage:
+    python build_mixture.py simal=simal.jsonl banking=banking.jsonl rft=rft_training_data_final.jsonl \
+        --weights simal=0.2,banking=0.5,rft=0.3 --total 5000 -o mixture.jsonl --seed 7
+"""
+import argparse
+import heapq
+import json
+import random
+
+from generate_merged_training import parse_source_spec, read_jsonl
+
+
+def count_records(path):
+    """Count non-blank lines without decoding them."""
+    with open(path, "rb") as f:
+        return sum(1 for line in f if line.strip())
+
+
+def parse_mapping(text, cast):
+    """Parse 'a=1,b=2' into {"a": cast("1"), "b": cast("2")}."""
+    mapping = {}
+    for item in filter(None, (part.strip() for part in text.split(","))):
+        name, value = item.split("=", 1)
+        mapping[name.strip()] = cast(value)
+    return mapping
+
+
+def targets_from_weights(sizes, weights, total):
+    """Largest-remainder rounding of weight shares to integer counts summing to total."""
+    weight_sum = sum(weights.get(name, 0.0) for name in sizes)
+    if weight_sum <= 0:
+        raise ValueError("weights must sum to a positive number")
+    exact = {name: total * weights.get(name, 0.0) / weight_sum for name in sizes}
+    targets = {name: int(value) for name, value in exact.items()}
+    leftover = total - sum(targets.values())
+    for name in sorted(exact, key=lambda n: exact[n] - targets[n], reverse=True)[:leftover]:
+        targets[name] += 1
+    return targets
+
+
+def resampled(path, size, target, rng):
+    """Stream a source in passes, emitting each record the number of times its target requires."""
+    if size == 0 or target == 0:
+        return
+    base, extra = divmod(target, size)
+    for _ in range(base):
+        yield from read_jsonl(path)
+    remaining = size
+    for record in read_jsonl(path) if extra else ():
+        if rng.random() * remaining < extra:
+            extra -= 1
+            yield record
+        remaining -= 1
+
+
+def interleave(streams, targets, seed):
+    """Stride scheduling: always emit from the source furthest behind its share."""
+    rng = random.Random(seed)
+    heap = []
+    for order, (name, stream) in enumerate(streams.items()):
+        if targets[name]:
+            stride = 1.0 / targets[name]
+            heapq.heappush(heap, (rng.random() * stride, order, name, stride))
+    while heap:
+        pass_value, order, name, stride = heapq.heappop(heap)
+        record = next(streams[name], None)
+        if record is None:
+            continue
+        yield name, record
+        heapq.heappush(heap, (pass_value + stride, order, name, stride))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Interleave sources into a weighted mixture.")
+    parser.add_argument("sources", nargs="+", help="source JSONL files as name=path")
+    group = parser.add_mutually_exclusive_group(required=True)
+    group.add_argument("--weights", help="name=weight,... (with --total)")
+    group.add_argument("--targets", help="name=count,... exact per-source counts")
+    parser.add_argument("--total", type=int, default=None, help="output size for --weights (default: sum of sources)")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("-o", "--output", required=True)
+    args = parser.parse_args()
+
+    specs = [parse_source_spec(spec) for spec in args.sources]
+    paths = {}
+    for name, path in specs:
+        if name in paths:
+            parser.error(f"source name {name!r} is given more than once")
+        paths[name] = path
+    sizes = {name: count_records(path) for name, path in paths.items()}
+    try:
+        mapping = parse_mapping(args.targets, int) if args.targets else parse_mapping(args.weights, float)
+    except ValueError:
+        parser.error("expected name=value,... in --weights/--targets")
+    unknown = set(mapping) - set(paths)
+    if unknown:
+        parser.error(f"unknown sources in weights/targets: {', '.join(sorted(unknown))}")
+    if args.targets:
+        targets = dict({name: 0 for name in paths}, **mapping)
+    else:
+        try:
+            targets = targets_from_weights(sizes, mapping, args.total or sum(sizes.values()))
+        except ValueError as e:
+            parser.error(str(e))
+
+    rng = random.Random(args.seed)
+    streams = {name: resampled(paths[name], sizes[name], targets[name], random.Random(rng.random())) for name in paths}
+    emitted = {name: 0 for name in paths}
+    with open(args.output, "w", encoding="utf-8") as out:
+        for name, record in interleave(streams, targets, args.seed):
+            out.write(json.dumps(record, ensure_ascii=False) + "\n")
+            emitted[name] += 1
+
+    total = sum(emitted.values())
+    print(f"Wrote {total} examples to {args.output}")
+    target_total = sum(targets.values()) or 1
+    for name in paths:
+        ratio = emitted[name] / total if total else 0.0
+        print(f"  - {name}: {emitted[name]} of {sizes[name]} source records "
+              f"(x{emitted[name] / max(sizes[name], 1):.2f}), ratio {ratio:.3f} "
+              f"(target {targets[name] / target_total:.3f})")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,202 @@
+#!/usr/bin/env python3
+"""
+Rewrite training/eval records to one byte-identical instruction prefix.
+
+The merge script puts SYSTEM_PROMPT in a system message, while the RFT and
+eval files embed an ASCII-folded copy at the start of the user message
+("Sen Searcho AI arastirma planlama asistanisin... Kullanici talebi: ...").
+Providers only reuse cached prompt prefixes that match byte for byte, so
+every record is rewritten to [system: SYSTEM_PROMPT, user: bare request, ...].
+
+Usage:
+    python canonicalize_prompts.py rft_training_data_final.jsonl -o rft_canonical.jsonl
+    python canonicalize_prompts.py eval_data_rft.jsonl --report-only
+"""
+import argparse
+import json
+
+from generate_merged_training import SYSTEM_PROMPT, read_jsonl
+
+# Instruction headers seen in the data, by name. Matching is done on the
+# folded form, so diacritic/casing drift of the same text is also caught.
+INSTRUCTION_VARIANTS = {
+    "system_prompt": SYSTEM_PROMPT,
+    "rft_ascii": (
+        "Sen Searcho AI arastirma planlama asistanisin. Kullanicinin arastirma talebini analiz et "
+        "ve yapilandirilmis bir arastirma plani olustur. SADECE JSON formatinda yanit ver."
+    ),
+}
+REQUEST_MARKERS = ("Kullanici talebi:", "Kullanıcı talebi:")
+
+_FOLD = str.maketrans("çğıöşüÇĞİÖŞÜâîû", "cgiosuCGIOSUaiu")
+
+
+def fold(text):
+    """ASCII-fold Turkish characters and lowercase, keeping string length."""
+    return text.translate(_FOLD).lower()
+
+
+_FOLDED_VARIANTS = [(name, fold(text)) for name, text in INSTRUCTION_VARIANTS.items()]
+
+
+def match_instruction(text):
+    """Return (variant_name, prefix_length) if text starts with a known header."""
+    folded = fold(text.lstrip())
+    offset = len(text) - len(text.lstrip())
+    for name, variant in _FOLDED_VARIANTS:
+        if folded.startswith(variant):
+            return name, offset + len(variant)
+    return None, 0
+
+
+def request_text(user_msg):
+    """Strip an embedded instruction header and request marker from a user turn."""
+    _, end = match_instruction(user_msg)
+    text = user_msg[end:].strip()
+    for marker in REQUEST_MARKERS:
+        if fold(text).startswith(fold(marker)):
+            return text[len(marker):].strip()
+    return text
+
+
+def canonicalize_example(example):
+    """Return (canonical_example, variant_name).
+
+    variant_name is "canonical" for records already in the target shape and
+    "unknown_system" when a system message could not be recognized; such
+    records keep their system message untouched.
+    """
+    messages = example["messages"]
+    variant = "canonical"
+    system = None
+    rest = []
+    for msg in messages:
+        if msg["role"] == "system":
+            name, end = match_instruction(msg["content"])
+            if name is None or msg["content"][end:].strip():
+                system, variant = msg, "unknown_system"
+            elif msg["content"] != SYSTEM_PROMPT:
+                variant = name
+        elif msg["role"] == "user":
+            name, _ = match_instruction(msg["content"])
+            request = request_text(msg["content"])
+            if request != msg["content"].strip():
+                variant = name or "request_marker"
+            rest.append({"role": "user", "content": request})
+        else:
+            rest.append(msg)
+
+    canonical = dict(example)
+    canonical["messages"] = [system or {"role": "system", "content": SYSTEM_PROMPT}] + rest
+    if variant == "canonical" and canonical["messages"] != messages:
+        variant = "missing_system"
+    return canonical, variant
+
+
+def render_prompt(messages):
+    """Approximate the serialized prompt a provider sees (request turns only)."""
+    return "".join(f"<|{m['role']}|>{m['content']}" for m in messages if m["role"] != "assistant")
+
+
+def shared_prefix_length(a, b):
+    n = min(len(a), len(b))
+    i = 0
+    while i < n and a[i] == b[i]:
+        i += 1
+    return i
+
+
+def cacheable_tokens(prefix_tokens, minimum, block):
+    """Tokens a provider would serve from cache for a given shared prefix."""
+    if prefix_tokens < minimum:
+        return 0
+    return minimum + (prefix_tokens - minimum) // block * block
+
+
+class PrefixReport:
+    """Accumulates shared-prefix statistics for a stream of records."""
+
+    def __init__(self, chars_per_token, cache_min_tokens, cache_block_tokens):
+        self.target = render_prompt([{"role": "system", "content": SYSTEM_PROMPT}])
+        self.chars_per_token = chars_per_token
+        self.cache_min_tokens = cache_min_tokens
+        self.cache_block_tokens = cache_block_tokens
+        self.records = 0
+        self.full_prefix = 0
+        self.shared_chars = 0
+        self.prompt_chars = 0
+        self.cacheable = 0
+
+    def add(self, messages):
+        prompt = render_prompt(messages)
+        shared = shared_prefix_length(prompt, self.target)
+        self.records += 1
+        self.full_prefix += shared == len(self.target)
+        self.shared_chars += shared
+        self.prompt_chars += len(prompt)
+        self.cacheable += cacheable_tokens(
+            int(shared / self.chars_per_token), self.cache_min_tokens, self.cache_block_tokens
+        )
+
+    def summary(self):
+        n = max(self.records, 1)
+        return {
+            "records": self.records,
+            "records_with_full_prefix": self.full_prefix,
+            "shared_prefix_ratio": round(self.shared_chars / max(self.prompt_chars, 1), 4),
+            "avg_shared_prefix_tokens": round(self.shared_chars / n / self.chars_per_token, 1),
+            "avg_prompt_tokens": round(self.prompt_chars / n / self.chars_per_token, 1),
+            "expected_cacheable_tokens_per_request": round(self.cacheable / n, 1),
+        }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Canonicalize instruction prefixes for prompt caching.")
+    parser.add_argument("inputs", nargs="+", help="JSONL files to canonicalize")
+    parser.add_argument("-o", "--output", help="write canonical records here")
+    parser.add_argument("--report-only", action="store_true", help="only print the prefix report")
+    parser.add_argument("--chars-per-token", type=float, default=3.5, help="token estimate for Turkish text")
+    parser.add_argument("--cache-min-tokens", type=int, default=1024, help="provider minimum cacheable prefix")
+    parser.add_argument("--cache-block-tokens", type=int, default=128, help="provider cache granularity")
+    parser.add_argument("--json-out", default=None, help="also write the report as JSON")
+    args = parser.parse_args()
+    if not args.output and not args.report_only:
+        parser.error("give -o/--output or --report-only")
+
+    report_args = (args.chars_per_token, args.cache_min_tokens, args.cache_block_tokens)
+    before, after = PrefixReport(*report_args), PrefixReport(*report_args)
+    variants = {}
+    out = open(args.output, "w", encoding="utf-8") if args.output else None
+    try:
+        for path in args.inputs:
+            for example in read_jsonl(path):
+                canonical, variant = canonicalize_example(example)
+                variants[variant] = variants.get(variant, 0) + 1
+                before.add(example["messages"])
+                after.add(canonical["messages"])
+                if out:
+                    out.write(json.dumps(canonical, ensure_ascii=False) + "\n")
+    finally:
+        if out:
+            out.close()
+
+    report = {"variants": variants, "before": before.summary(), "after": after.summary()}
+    print(f"Instruction variants: {variants}")
+    for name in ("before", "after"):
+        s = report[name]
+        print(f"  {name}: {s['records_with_full_prefix']}/{s['records']} share the canonical prefix, "
+              f"shared-prefix ratio {s['shared_prefix_ratio']:.1%}, "
+              f"~{s['avg_shared_prefix_tokens']} of {s['avg_prompt_tokens']} tokens shared, "
+              f"~{s['expected_cacheable_tokens_per_request']} cacheable per request")
+    if after.summary()["avg_shared_prefix_tokens"] < args.cache_min_tokens:
+        print(f"  note: the shared prefix is below the {args.cache_min_tokens}-token cache minimum; "
+              f"add few-shot examples after the system prompt to reach it")
+    if args.output:
+        print(f"Wrote {after.records} canonical records to {args.output}")
+    if args.json_out:
+        with open(args.json_out, "w", encoding="utf-8") as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,232 @@
+#!/usr/bin/env python3
+"""
+Detect eval prompts that also appear, verbatim or lightly edited, in the
+training data.
+
+The training side is indexed once: every request is normalized (instruction
+header stripped, Turkish characters folded, lowercased) and split into
+hashed word n-grams, character n-grams and stemmed terms, stored as postings
+lists. An eval request is scored by walking only the postings of its own
+grams, so the cost depends on how many training requests share grams with
+it, not on the size of the training set. N-grams that occur in a large share
+of training records (boilerplate like "araştırmak istiyoruz") are dropped
+from the index.
+
+Overlap is symmetric, so neither a short generic request nor a long one is
+favoured: word and character n-grams are compared by Dice over the grams
+that survive pruning, and stemmed terms by idf-weighted Dice, which catches
+paraphrases that share the topic words but little wording ("limitini
+artırma akışını test etmemiz gerekiyor" vs "limit artırma ve azaltma
+deneyimini araştıralım"). A channel is only scored when the eval request
+keeps at least --min-grams grams in it. The pair's overlap is the highest
+channel. Pairs at or above --report-threshold are listed; any pair at or
+above --fail-threshold makes the script exit with status 1 for CI.
+
+Usage:
+    python check_contamination.py --train rft_training_data_final.jsonl merged_training_data.jsonl \
+        --eval eval_data_rft.jsonl --fail-threshold 0.8
+"""
+import argparse
+import hashlib
+import json
+import math
+import re
+import sys
+from collections import defaultdict
+
+from canonicalize_prompts import fold, request_text
+from generate_merged_training import get_user_message, read_jsonl
+from plan_cache_service import stem
+
+_WORDS = re.compile(r"\w+", re.UNICODE)
+
+
+def normalize(text):
+    """Folded, lowercased request text with collapsed whitespace."""
+    return " ".join(_WORDS.findall(fold(request_text(text))))
+
+
+def _hash(kind, gram):
+    return int.from_bytes(hashlib.blake2b(f"{kind}:{gram}".encode("utf-8"), digest_size=8).digest(), "big")
+
+
+def ngram_hashes(normalized, word_n=3, char_n=5):
+    """Hashed word and character n-gram sets of a normalized request."""
+    words = normalized.split()
+    word_grams = {_hash("w", " ".join(words[i:i + word_n])) for i in range(max(len(words) - word_n + 1, 1))} if words else set()
+    padded = f" {normalized} "
+    char_grams = {_hash("c", padded[i:i + char_n]) for i in range(max(len(padded) - char_n + 1, 1))}
+    return word_grams, char_grams
+
+
+def terms(normalized):
+    """Stemmed word set of a normalized request."""
+    return {stem(word) for word in normalized.split()}
+
+
+class ContaminationIndex:
+    """Postings lists from hashed n-grams to training record ids."""
+
+    def __init__(self, word_n=3, char_n=5, max_df=0.05, min_grams=3):
+        self.word_n = word_n
+        self.char_n = char_n
+        self.max_df = max_df
+        self.min_grams = min_grams
+        self.texts = []
+        self.sources = []
+        self.exact = {}
+        self.pruned = set()
+        self.word_postings = defaultdict(list)
+        self.char_postings = defaultdict(list)
+        self.term_postings = defaultdict(list)
+        self.word_counts = []
+        self.char_counts = []
+        self.term_weights = []
+        self.idf = {}
+
+    def add(self, text, source):
+        normalized = normalize(text)
+        if not normalized:
+            return
+        if normalized in self.exact:
+            sources = self.sources[self.exact[normalized]]
+            if source not in sources:
+                sources.append(source)
+            return
+        record_id = len(self.texts)
+        self.texts.append(text)
+        self.sources.append([source])
+        self.exact[normalized] = record_id
+        word_grams, char_grams = ngram_hashes(normalized, self.word_n, self.char_n)
+        for h in word_grams:
+            self.word_postings[h].append(record_id)
+        for h in char_grams:
+            self.char_postings[h].append(record_id)
+        for term in terms(normalized):
+            self.term_postings[term].append(record_id)
+        self.word_counts.append(len(word_grams))
+        self.char_counts.append(len(char_grams))
+
+    def prune(self):
+        """Drop n-grams shared by more than max_df of the training records and weight the terms.
+
+        Call once after the last add().
+        """
+        limit = max(int(self.max_df * len(self.texts)), 10)
+        for postings, counts in ((self.word_postings, self.word_counts), (self.char_postings, self.char_counts)):
+            for h in [h for h, ids in postings.items() if len(ids) > limit]:
+                for record_id in postings.pop(h):
+                    counts[record_id] -= 1
+                self.pruned.add(h)
+        self.idf = {term: self._idf(len(ids)) for term, ids in self.term_postings.items()}
+        self.term_weights = [0.0] * len(self.texts)
+        for term, ids in self.term_postings.items():
+            for record_id in ids:
+                self.term_weights[record_id] += self.idf[term]
+
+    def _idf(self, df):
+        return math.log((len(self.texts) + 1) / (df + 1))
+
+    def _dice(self, grams, postings, counts):
+        """Dice overlap of the request's non-boilerplate grams with each training record's."""
+        grams = grams - self.pruned
+        if len(grams) < self.min_grams:
+            return {}
+        shared = defaultdict(int)
+        for h in grams:
+            for record_id in postings.get(h, ()):
+                shared[record_id] += 1
+        return {record_id: 2 * count / (len(grams) + counts[record_id]) for record_id, count in shared.items()}
+
+    def _term_dice(self, query_terms):
+        """idf-weighted Dice overlap of stemmed terms; terms unseen in training weigh the most."""
+        weights = {term: self.idf.get(term, self._idf(0)) for term in query_terms}
+        if len(weights) < self.min_grams:
+            return {}
+        total = sum(weights.values())
+        shared = defaultdict(float)
+        for term, weight in weights.items():
+            for record_id in self.term_postings.get(term, ()):
+                shared[record_id] += weight
+        return {record_id: 2 * weight / (total + self.term_weights[record_id]) if total else 0.0
+                for record_id, weight in shared.items()}
+
+    def score(self, text, top_k=3):
+        """Best-matching training records for a request as (score, word, char, term, record_id)."""
+        normalized = normalize(text)
+        if not normalized:
+            return []
+        if normalized in self.exact:
+            return [(1.0, 1.0, 1.0, 1.0, self.exact[normalized])]
+        word_grams, char_grams = ngram_hashes(normalized, self.word_n, self.char_n)
+        word = self._dice(word_grams, self.word_postings, self.word_counts)
+        char = self._dice(char_grams, self.char_postings, self.char_counts)
+        term = self._term_dice(terms(normalized))
+        scored = []
+        for r in set(word) | set(char) | set(term):
+            channels = (word.get(r, 0.0), char.get(r, 0.0), term.get(r, 0.0))
+            scored.append((max(channels),) + channels + (r,))
+        scored.sort(reverse=True)
+        return scored[:top_k]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Check eval prompts for overlap with training data.")
+    parser.add_argument("--train", nargs="+", required=True, help="training JSONL files")
+    parser.add_argument("--eval", nargs="+", required=True, help="eval JSONL files")
+    parser.add_argument("--word-n", type=int, default=3)
+    parser.add_argument("--char-n", type=int, default=5)
+    parser.add_argument("--max-df", type=float, default=0.05, help="drop n-grams in more than this share of records")
+    parser.add_argument("--min-grams", type=int, default=3, help="grams an eval request must keep for a channel to count")
+    parser.add_argument("--report-threshold", type=float, default=0.5)
+    parser.add_argument("--fail-threshold", type=float, default=0.9)
+    parser.add_argument("--json-out", default=None)
+    args = parser.parse_args()
+
+    index = ContaminationIndex(args.word_n, args.char_n, args.max_df, args.min_grams)
+    for path in args.train:
+        for example in read_jsonl(path):
+            index.add(get_user_message(example), path)
+    index.prune()
+    print(f"Indexed {len(index.texts)} distinct training requests "
+          f"({len(index.word_postings)} word / {len(index.char_postings)} char n-grams)")
+
+    pairs = []
+    evaluated = 0
+    for path in args.eval:
+        for example in read_jsonl(path):
+            text = get_user_message(example)
+            evaluated += 1
+            for score, word, char, term, record_id in index.score(text):
+                if score >= args.report_threshold:
+                    pairs.append({
+                        "eval_source": path,
+                        "eval": request_text(text),
+                        "train_sources": index.sources[record_id],
+                        "train": request_text(index.texts[record_id]),
+                        "overlap": round(score, 3),
+                        "word_overlap": round(word, 3),
+                        "char_overlap": round(char, 3),
+                        "term_overlap": round(term, 3),
+                    })
+
+    pairs.sort(key=lambda p: -p["overlap"])
+    failing = [p for p in pairs if p["overlap"] >= args.fail_threshold]
+    contaminated = len({p["eval"] for p in pairs})
+    print(f"Checked {evaluated} eval requests: {contaminated} overlap >= {args.report_threshold}, "
+          f"{len({p['eval'] for p in failing})} >= {args.fail_threshold}")
+    for p in pairs:
+        marker = "FAIL" if p["overlap"] >= args.fail_threshold else "warn"
+        print(f"  [{marker}] {p['overlap']:.2f} (word {p['word_overlap']:.2f}, char {p['char_overlap']:.2f}, "
+              f"term {p['term_overlap']:.2f})")
+        print(f"      eval:  {p['eval']}")
+        print(f"      train: {p['train']}  ({', '.join(p['train_sources'])})")
+    if args.json_out:
+        with open(args.json_out, "w", encoding="utf-8") as f:
+            json.dump({"evaluated": evaluated, "pairs": pairs}, f, ensure_ascii=False, indent=2)
+    if failing:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
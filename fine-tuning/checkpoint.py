@@ -0,0 +1,169 @@
+#!/usr/bin/env python3
+"""
+Crash-safe, resumable JSONL output for long pipeline runs.
+
+Records are written into numbered shards next to the final output. A shard
+is filled under a .tmp name, fsynced and renamed into place; the dedup keys
+first seen since the last commit are appended to a key log and fsynced;
+only then is the checkpoint journal rewritten (also temp file + rename) with
+the input positions, counters and the committed length of the key log. A
+crash therefore loses at most the shard in progress (key log bytes past the
+journaled length are cut off on resume), and a resumed run re-reads the
+inputs from the journaled positions, so the final output has no duplicates
+and no gaps. The final file is assembled from the shards and atomically
+renamed into place on finish().
+"""
+import hashlib
+import json
+import os
+from contextlib import contextmanager
+
+
+@contextmanager
+def atomic_write(path, mode="w", encoding="utf-8"):
+    """Write to path via a temp file that is fsynced and renamed into place."""
+    tmp = path + ".tmp"
+    with open(tmp, mode, encoding=None if "b" in mode else encoding) as f:
+        yield f
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp, path)
+
+
+def iter_jsonl_offsets(path, start=0):
+    """Yield (record, end_offset) from a JSONL file, starting at a byte offset."""
+    with open(path, "rb") as f:
+        f.seek(start)
+        position = start
+        for line in f:
+            position += len(line)
+            if line.strip():
+                yield json.loads(line), position
+
+
+def dedup_key(text):
+    """Compact digest of a dedup key, so journals stay small."""
+    return hashlib.sha1(text.encode("utf-8")).hexdigest()[:20]
+
+
+class CheckpointedWriter:
+    """Sharded JSONL writer with a resumable checkpoint journal.
+
+    Per-input positions are opaque to the writer: callers pass whatever lets
+    them resume an input (a byte offset for files, an item index for
+    generated lists) to write() and read it back with position().
+    """
+
+    def __init__(self, output_path, shard_size=1000):
+        self.output_path = output_path
+        self.shard_size = shard_size
+        self.journal_path = output_path + ".checkpoint.json"
+        self.keys_path = output_path + ".checkpoint.keys"
+        self.state = {"shards": 0, "records": 0, "positions": {}, "done": [], "counters": {}, "dedup_bytes": 0}
+        if os.path.exists(self.journal_path):
+            with open(self.journal_path, "r", encoding="utf-8") as f:
+                self.state = json.load(f)
+        self.resumed = self.state["records"] > 0 or bool(self.state["done"])
+        # Journals from before the key log kept the whole set inline; it is moved to the log on the next commit.
+        self.new_keys = self.state.pop("dedup", [])
+        self.state.setdefault("dedup_bytes", 0)
+        self.dedup = self._load_keys() | set(self.new_keys)
+        self.positions = dict(self.state["positions"])
+        self.counters = dict(self.state["counters"])
+        self.pending = []
+        self._remove_orphan_shards()
+
+    def _load_keys(self):
+        """Committed dedup keys; anything appended after the last journal write is cut off."""
+        if not os.path.exists(self.keys_path):
+            return set()
+        with open(self.keys_path, "r+b") as f:
+            f.truncate(self.state["dedup_bytes"])
+            return set(f.read().decode("ascii").split())
+
+    def shard_path(self, index):
+        return f"{self.output_path}.shard-{index:05d}"
+
+    def _remove_orphan_shards(self):
+        """Drop shards written after the last journaled commit."""
+        index = self.state["shards"]
+        while os.path.exists(self.shard_path(index)) or os.path.exists(self.shard_path(index) + ".tmp"):
+            for path in (self.shard_path(index), self.shard_path(index) + ".tmp"):
+                if os.path.exists(path):
+                    os.remove(path)
+            index += 1
+
+    def position(self, source, default=0):
+        return self.positions.get(source, default)
+
+    def is_done(self, source):
+        return source in self.state["done"]
+
+    def seen(self, key):
+        return dedup_key(key) in self.dedup
+
+    def mark_seen(self, key):
+        digest = dedup_key(key)
+        if digest not in self.dedup:
+            self.dedup.add(digest)
+            self.new_keys.append(digest)
+
+    def count(self, name, amount=1):
+        self.counters[name] = self.counters.get(name, 0) + amount
+
+    def write(self, record, source, position):
+        """Queue a record; position is where `source` resumes after it."""
+        self.pending.append(record)
+        self.positions[source] = position
+        if len(self.pending) >= self.shard_size:
+            self.commit()
+
+    def advance(self, source, position):
+        """Move an input's resume position past a record that was not written."""
+        self.positions[source] = position
+
+    def mark_done(self, source):
+        """Record that an input is fully consumed and commit."""
+        if source not in self.state["done"]:
+            self.state["done"].append(source)
+        self.commit()
+
+    def commit(self):
+        """Persist pending records as a shard and new dedup keys to the key log, then journal the new state."""
+        if self.pending:
+            with atomic_write(self.shard_path(self.state["shards"])) as f:
+                for record in self.pending:
+                    f.write(json.dumps(record, ensure_ascii=False) + "\n")
+            self.state["shards"] += 1
+            self.state["records"] += len(self.pending)
+            self.pending = []
+        self.state["positions"] = dict(self.positions)
+        self.state["counters"] = dict(self.counters)
+        if self.new_keys:
+            with open(self.keys_path, "ab") as f:
+                f.write("".join(key + "\n" for key in self.new_keys).encode("ascii"))
+                f.flush()
+                os.fsync(f.fileno())
+                self.state["dedup_bytes"] = f.tell()
+            self.new_keys = []
+        with atomic_write(self.journal_path) as f:
+            json.dump(self.state, f)
+
+    def finish(self):
+        """Assemble shards into the final output atomically and clean up."""
+        self.commit()
+        with atomic_write(self.output_path, "wb") as out:
+            for index in range(self.state["shards"]):
+                with open(self.shard_path(index), "rb") as shard:
+                    while True:
+                        block = shard.read(1 << 20)
+                        if not block:
+                            break
+                        out.write(block)
+        # Journal first: without it a rerun starts over and clears any shards or keys left behind.
+        os.remove(self.journal_path)
+        for index in range(self.state["shards"]):
+            os.remove(self.shard_path(index))
+        if os.path.exists(self.keys_path):
+            os.remove(self.keys_path)
+        return self.state["records"]
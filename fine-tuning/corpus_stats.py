@@ -0,0 +1,161 @@
+#!/usr/bin/env python3
+"""
+Single-pass corpus statistics for training JSONL files.
+
+One streaming read fills flat per-record, per-section and per-question
+feature arrays; histograms, percentiles and per-source breakdowns are then
+computed with NumPy and written as JSON and Markdown.
+
+Usage:
+    python corpus_stats.py merged=merged_training_data.jsonl eval=eval_data_rft.jsonl -o stats
+"""
+import argparse
+import json
+from array import array
+
+import numpy as np
+
+from canonicalize_prompts import request_text
+from generate_merged_training import get_plan, get_plan_sections, get_user_message, parse_source_spec, read_jsonl
+
+PERCENTILES = (50, 90, 99)
+RECORD_FEATURES = ("messages", "user_chars", "complete", "has_plan", "sections", "questions", "duplicate_section_ids")
+
+
+def _int32(values):
+    return np.frombuffer(values, dtype=np.int32) if len(values) else np.zeros(0, np.int32)
+
+
+def collect_features(inputs):
+    """Stream inputs once; returns (source_names, record, section, question arrays)."""
+    sources = []
+    record = {name: array("i") for name in ("source",) + RECORD_FEATURES}
+    section_questions, section_record = array("i"), array("i")
+    question_chars, question_record = array("i"), array("i")
+
+    row = 0
+    for spec in inputs:
+        source, path = parse_source_spec(spec)
+        if source not in sources:
+            sources.append(source)
+        source_id = sources.index(source)
+        for example in read_jsonl(path):
+            plan = get_plan(example)
+            sections = get_plan_sections(plan)
+            ids = [s.get("id") for s in sections]
+            questions = 0
+            for section in sections:
+                qs = [q for q in section.get("questions", []) if isinstance(q, str)]
+                section_questions.append(len(qs))
+                section_record.append(row)
+                for q in qs:
+                    question_chars.append(len(q))
+                    question_record.append(row)
+                questions += len(qs)
+
+            record["source"].append(source_id)
+            record["messages"].append(len(example["messages"]))
+            record["user_chars"].append(len(request_text(get_user_message(example))))
+            # Prompt-only records may or may not carry a system message, so go by the last turn.
+            record["complete"].append(example["messages"][-1]["role"] == "assistant" or plan is not None)
+            record["has_plan"].append(plan is not None)
+            record["sections"].append(len(sections))
+            record["questions"].append(questions)
+            record["duplicate_section_ids"].append(len(ids) - len(set(ids)))
+            row += 1
+
+    records = {name: _int32(values) for name, values in record.items()}
+    sections_np = {"questions": _int32(section_questions), "record": _int32(section_record)}
+    questions_np = {"chars": _int32(question_chars), "record": _int32(question_record)}
+    return sources, records, sections_np, questions_np
+
+
+def describe(values, bins=10):
+    """Summary statistics plus a histogram for one integer feature."""
+    if values.size == 0:
+        return {"count": 0}
+    summary = {
+        "count": int(values.size),
+        "mean": round(float(values.mean()), 2),
+        "min": int(values.min()),
+        "max": int(values.max()),
+    }
+    for q, value in zip(PERCENTILES, np.percentile(values, PERCENTILES)):
+        summary[f"p{q}"] = round(float(value), 1)
+    if values.max() - values.min() < 32:
+        counts = np.bincount(values - values.min())
+        edges = np.arange(values.min(), values.max() + 1)
+        summary["histogram"] = {str(int(e)): int(c) for e, c in zip(edges, counts) if c}
+    else:
+        counts, edges = np.histogram(values, bins=bins)
+        summary["histogram"] = {f"{int(lo)}-{int(hi)}": int(c) for lo, hi, c in zip(edges[:-1], edges[1:], counts)}
+    return summary
+
+
+def build_report(sources, records, sections, questions):
+    """Compute global and per-source statistics from the feature arrays."""
+
+    def block(record_mask):
+        section_mask = record_mask[sections["record"]]
+        question_mask = record_mask[questions["record"]]
+        plans = record_mask & (records["has_plan"] == 1)
+        return {
+            "records": int(record_mask.sum()),
+            "complete": int((record_mask & (records["complete"] == 1)).sum()),
+            "prompt_only": int((record_mask & (records["complete"] == 0)).sum()),
+            "with_plan": int(plans.sum()),
+            "plans_with_duplicate_section_ids": int((plans & (records["duplicate_section_ids"] > 0)).sum()),
+            "messages": describe(records["messages"][record_mask]),
+            "user_chars": describe(records["user_chars"][record_mask]),
+            "sections_per_plan": describe(records["sections"][plans]),
+            "questions_per_plan": describe(records["questions"][plans]),
+            "questions_per_section": describe(sections["questions"][section_mask]),
+            "question_chars": describe(questions["chars"][question_mask]),
+        }
+
+    everything = np.ones(records["source"].size, dtype=bool)
+    return {
+        "total": block(everything),
+        "by_source": {name: block(records["source"] == i) for i, name in enumerate(sources)},
+    }
+
+
+def to_markdown(report):
+    lines = ["# Training corpus statistics", ""]
+    groups = [("All sources", report["total"])] + list(report["by_source"].items())
+    lines += ["| Source | Records | Complete | Prompt-only | Plans w/ duplicate ids |",
+              "|---|---:|---:|---:|---:|"]
+    for name, stats in groups:
+        lines.append(f"| {name} | {stats['records']} | {stats['complete']} | {stats['prompt_only']} "
+                     f"| {stats['plans_with_duplicate_section_ids']} |")
+    for name, stats in groups:
+        lines += ["", f"## {name}", "", "| Feature | Count | Mean | p50 | p90 | p99 | Max |",
+                  "|---|---:|---:|---:|---:|---:|---:|"]
+        for feature in ("messages", "user_chars", "sections_per_plan", "questions_per_plan",
+                        "questions_per_section", "question_chars"):
+            s = stats[feature]
+            if s["count"]:
+                lines.append(f"| {feature} | {s['count']} | {s['mean']} | {s['p50']} | {s['p90']} "
+                             f"| {s['p99']} | {s['max']} |")
+    return "\n".join(lines) + "\n"
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compute corpus statistics in one pass.")
+    parser.add_argument("inputs", nargs="+", help="JSONL files, optionally as source=path")
+    parser.add_argument("-o", "--output", default="corpus_stats", help="output prefix (.json and .md)")
+    args = parser.parse_args()
+
+    report = build_report(*collect_features(args.inputs))
+    with open(args.output + ".json", "w", encoding="utf-8") as f:
+        json.dump(report, f, ensure_ascii=False, indent=2)
+    with open(args.output + ".md", "w", encoding="utf-8") as f:
+        f.write(to_markdown(report))
+
+    total = report["total"]
+    print(f"{total['records']} records ({total['complete']} complete, {total['prompt_only']} prompt-only)")
+    print(f"Wrote {args.output}.json and {args.output}.md")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,273 @@
+#!/usr/bin/env python3
+"""
+Lazy, composable pipelines over training examples.
+
+    from dataset import Dataset
+    from restore_diacritics import restore_record
+
+    (Dataset.from_jsonl("rft_training_data_final.jsonl", "merged_training_data.jsonl")
+        .map(restore_record, workers=4)
+        .filter(has_plan)
+        .shuffle_buffer(1000, seed=7)
+        .write_jsonl("restored.jsonl"))
+
+Nothing runs until a sink (iteration, to_list(), count(), write_jsonl()) is
+called. At that point the operations are planned into stages: adjacent
+map/filter/flat_map calls are fused into one per-record function, so a record
+goes through the whole chain in one step without intermediate lists. A fused
+stage containing map(..., workers=N) runs in a process pool over ordered
+chunks with a bounded number in flight. When such a stage reads straight from
+JSONL files, the workers also decode the lines, and when it feeds
+write_jsonl() directly they encode the output too, so each record is decoded
+and encoded exactly once and only compact strings cross processes.
+
+Functions passed to a parallel map (and every function fused with it) must
+be picklable top-level functions.
+
+Usage (benchmark of the diacritic restorer through the pipeline):
+    python dataset.py merged_training_data.jsonl -o restored.jsonl --workers 4
+"""
+import argparse
+import itertools
+import json
+import os
+import random
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from generate_merged_training import read_jsonl
+from parallel_jsonl import read_jsonl_parallel
+
+ELEMENTWISE = ("map", "filter", "flat_map")
+PARALLEL_CHUNK_BYTES = 1024 * 1024
+
+
+def _name(fn):
+    return getattr(fn, "__name__", type(fn).__name__)
+
+
+class FusedStage:
+    """Adjacent map/filter/flat_map steps applied as one record -> list function."""
+
+    def __init__(self, steps, encode=False):
+        self.steps = steps
+        self.encode = encode
+
+    def __call__(self, record):
+        items = [record]
+        for kind, fn in self.steps:
+            if kind == "map":
+                items = [fn(item) for item in items]
+            elif kind == "filter":
+                items = [item for item in items if fn(item)]
+            else:
+                items = [out for item in items for out in fn(item)]
+            if not items:
+                break
+        if self.encode:
+            return [json.dumps(item, ensure_ascii=False) + "\n" for item in items]
+        return items
+
+    def apply_chunk(self, records):
+        return [out for record in records for out in self(record)]
+
+    def describe(self):
+        return "fused[" + " -> ".join(f"{kind}({_name(fn)})" for kind, fn in self.steps) + "]"
+
+
+class Dataset:
+    """A source plus a tuple of operations; every method returns a new Dataset."""
+
+    def __init__(self, source, ops=()):
+        self.source = source
+        self.ops = tuple(ops)
+
+    @classmethod
+    def from_jsonl(cls, *paths):
+        return cls(("jsonl", paths))
+
+    @classmethod
+    def from_examples(cls, examples):
+        """From a list/iterable of records, or a function returning one (called per run)."""
+        return cls(("examples", examples))
+
+    def _then(self, *op):
+        return Dataset(self.source, self.ops + (op,))
+
+    # -- operations -----------------------------------------------------------
+
+    def map(self, fn, workers=None, chunk_size=256):
+        """Apply fn to every record; with workers > 1 the fused stage runs in a process pool.
+
+        chunk_size is the number of records sent to a worker at a time. When
+        the stage reads straight from JSONL files the workers get byte ranges
+        of PARALLEL_CHUNK_BYTES instead, and chunk_size is not used.
+        """
+        return self._then("map", fn, workers or 1, chunk_size)
+
+    def filter(self, predicate):
+        return self._then("filter", predicate)
+
+    def flat_map(self, fn):
+        return self._then("flat_map", fn)
+
+    def batch(self, size, drop_remainder=False):
+        if size < 1:
+            raise ValueError(f"batch size must be at least 1, got {size}")
+        return self._then("batch", size, drop_remainder)
+
+    def take(self, n):
+        if n < 0:
+            raise ValueError(f"take count must be non-negative, got {n}")
+        return self._then("take", n)
+
+    def shuffle_buffer(self, size, seed=0):
+        if size < 1:
+            raise ValueError(f"shuffle buffer size must be at least 1, got {size}")
+        return self._then("shuffle_buffer", size, seed)
+
+    # -- planning -------------------------------------------------------------
+
+    def _stages(self):
+        """Group the operations into ("fused", FusedStage, workers, chunk_size) and single-op stages."""
+        stages = []
+        for op in self.ops:
+            kind = op[0]
+            if kind not in ELEMENTWISE:
+                stages.append(op)
+                continue
+            if not stages or stages[-1][0] != "fused":
+                stages.append(["fused", FusedStage([]), 1, 256])
+            stage = stages[-1]
+            stage[1].steps.append((kind, op[1]))
+            if kind == "map" and op[2] > stage[2]:
+                stage[2], stage[3] = op[2], op[3]
+        return stages
+
+    def explain(self):
+        """One-line description of the planned stages."""
+        kind, value = self.source
+        parts = [f"jsonl({', '.join(value)})" if kind == "jsonl" else f"examples({_name(value)})"]
+        for stage in self._stages():
+            if stage[0] == "fused":
+                workers = f" x{stage[2]} workers" if stage[2] > 1 else ""
+                parts.append(stage[1].describe() + workers)
+            else:
+                parts.append(f"{stage[0]}({', '.join(map(str, stage[1:]))})")
+        return " -> ".join(parts)
+
+    # -- execution ------------------------------------------------------------
+
+    def _run(self, encode=False):
+        """Iterate the pipeline; with encode=True yields JSON lines instead of records."""
+        stages = self._stages()
+        kind, value = self.source
+        fused_source = kind == "jsonl" and stages and stages[0][0] == "fused" and stages[0][2] > 1
+        encoded = False
+        if fused_source:
+            _, stage, workers, _ = stages.pop(0)  # chunks are PARALLEL_CHUNK_BYTES ranges, not chunk_size records
+            encoded = encode and not stages
+            transform = FusedStage(stage.steps, encode=encoded)
+            stream = itertools.chain.from_iterable(
+                items for path in value
+                for items in read_jsonl_parallel(path, workers, PARALLEL_CHUNK_BYTES, transform=transform)
+            )
+        elif kind == "jsonl":
+            stream = itertools.chain.from_iterable(read_jsonl(path) for path in value)
+        else:
+            stream = iter(value() if callable(value) else value)
+
+        for stage in stages:
+            stream = _STAGE_RUNNERS[stage[0]](stream, *stage[1:])
+        if encode and not encoded:
+            stream = (json.dumps(record, ensure_ascii=False) + "\n" for record in stream)
+        return stream
+
+    def __iter__(self):
+        return self._run()
+
+    def to_list(self):
+        return list(self._run())
+
+    def count(self):
+        return sum(1 for _ in self._run())
+
+    def write_jsonl(self, path):
+        """Write the pipeline's records to path; returns the count."""
+        count = 0
+        with open(path, "w", encoding="utf-8") as out:
+            for line in self._run(encode=True):
+                out.write(line)
+                count += 1
+        return count
+
+
+def _run_fused(stream, stage, workers, chunk_size):
+    if workers <= 1:
+        for record in stream:
+            yield from stage(record)
+        return
+    chunks = iter(lambda: list(itertools.islice(stream, chunk_size)), [])
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        pending = [pool.submit(stage.apply_chunk, chunk) for chunk in itertools.islice(chunks, workers * 2)]
+        while pending:
+            results = pending.pop(0).result()
+            for chunk in itertools.islice(chunks, 1):
+                pending.append(pool.submit(stage.apply_chunk, chunk))
+            yield from results
+
+
+def _run_batch(stream, size, drop_remainder):
+    while True:
+        batch = list(itertools.islice(stream, size))
+        if not batch or (drop_remainder and len(batch) < size):
+            return
+        yield batch
+
+
+def _run_take(stream, n):
+    return itertools.islice(stream, n)
+
+
+def _run_shuffle_buffer(stream, size, seed):
+    """Keep `size` records buffered and emit a random one as each new record arrives."""
+    rng = random.Random(seed)
+    buffer = list(itertools.islice(stream, size))
+    for record in stream:
+        i = rng.randrange(len(buffer))
+        yield buffer[i]
+        buffer[i] = record
+    rng.shuffle(buffer)
+    yield from buffer
+
+
+_STAGE_RUNNERS = {
+    "fused": _run_fused,
+    "batch": _run_batch,
+    "take": _run_take,
+    "shuffle_buffer": _run_shuffle_buffer,
+}
+
+
+def has_plan(example):
+    return example["messages"][-1]["role"] == "assistant"
+
+
+def main():
+    from restore_diacritics import restore_record
+
+    parser = argparse.ArgumentParser(description="Run restore_record over JSONL files through a Dataset pipeline.")
+    parser.add_argument("inputs", nargs="+")
+    parser.add_argument("-o", "--output", required=True)
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    args = parser.parse_args()
+
+    for workers in sorted({1, args.workers}):
+        pipeline = Dataset.from_jsonl(*args.inputs).map(restore_record, workers=workers).filter(has_plan)
+        started = time.perf_counter()
+        count = pipeline.write_jsonl(args.output)
+        print(f"{pipeline.explain()}: {count} records in {time.perf_counter() - started:.2f}s")
+
+
+if __name__ == "__main__":
+    main()
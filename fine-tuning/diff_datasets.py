@@ -0,0 +1,169 @@
+#!/usr/bin/env python3
+"""
+Diff two versions of a training JSONL by record instead of by text line.
+
+Records are keyed by a hash of their normalized request (instruction header
+stripped, stripped and lowercased, the same rule main() dedups by) and
+fingerprinted by a hash of their full canonical JSON. One streaming pass over
+each file keeps only {key: [(fingerprint, byte offset), ...]} in memory.
+Records sharing a key (such as the complete and prompt-only copies of one
+request) are paired by identical fingerprint first and the rest in file
+order, so an untouched copy never shows up as a modification of its twin.
+The records behind modified pairs are then re-read by offset to compute a
+section- and question-level delta of their plans.
+
+Usage:
+    python diff_datasets.py merged_training_data.old.jsonl merged_training_data.jsonl --json-out diff.json
+"""
+import argparse
+import hashlib
+import json
+
+from canonicalize_prompts import request_text
+from checkpoint import iter_jsonl_offsets
+from generate_merged_training import get_plan, get_plan_sections, get_user_message
+
+
+def record_key(example):
+    normalized = request_text(get_user_message(example)).strip().lower()
+    return hashlib.sha1(normalized.encode("utf-8")).digest()
+
+
+def fingerprint(example):
+    canonical = json.dumps(example, ensure_ascii=False, sort_keys=True, separators=(",", ":"))
+    return hashlib.sha1(canonical.encode("utf-8")).digest()
+
+
+def scan(path):
+    """Map record key -> [(fingerprint, start offset), ...] in file order."""
+    entries = {}
+    start = 0
+    for example, end in iter_jsonl_offsets(path):
+        entries.setdefault(record_key(example), []).append((fingerprint(example), start))
+        start = end
+    return entries
+
+
+def pair_entries(old_entries, new_entries):
+    """(unchanged count, modified (old, new) offset pairs, added offsets, removed offsets) for one key."""
+    remaining_old = list(old_entries)
+    unmatched_new = []
+    unchanged = 0
+    for fp, offset in new_entries:
+        match = next((i for i, (old_fp, _) in enumerate(remaining_old) if old_fp == fp), None)
+        if match is None:
+            unmatched_new.append(offset)
+        else:
+            del remaining_old[match]
+            unchanged += 1
+    remaining_old = [offset for _, offset in remaining_old]
+    pairs = list(zip(remaining_old, unmatched_new))
+    return unchanged, pairs, unmatched_new[len(pairs):], remaining_old[len(pairs):]
+
+
+def read_at(path, offset):
+    with open(path, "rb") as f:
+        f.seek(offset)
+        line = f.readline()
+        while not line.strip():
+            line = f.readline()
+        return json.loads(line)
+
+
+def plan_delta(old, new):
+    """Section/question-level changes between two versions of a record."""
+    old_plan, new_plan = get_plan(old), get_plan(new)
+    delta = {"request": request_text(get_user_message(new))}
+    if old_plan is None or new_plan is None:
+        if old_plan is None and new_plan is None:
+            delta["messages_changed"] = True
+        else:
+            delta["plan"] = "added" if old_plan is None else "removed"
+        return delta
+
+    if old_plan.get("chatResponse") != new_plan.get("chatResponse"):
+        delta["chat_response_changed"] = True
+    old_title = (old_plan.get("researchPlan") or {}).get("title")
+    new_title = (new_plan.get("researchPlan") or {}).get("title")
+    if old_title != new_title:
+        delta["title"] = {"old": old_title, "new": new_title}
+
+    old_sections = {s.get("id"): s for s in get_plan_sections(old_plan)}
+    new_sections = {s.get("id"): s for s in get_plan_sections(new_plan)}
+    delta["sections_added"] = [i for i in new_sections if i not in old_sections]
+    delta["sections_removed"] = [i for i in old_sections if i not in new_sections]
+    changed = {}
+    for section_id in new_sections.keys() & old_sections.keys():
+        old_q = old_sections[section_id].get("questions", [])
+        new_q = new_sections[section_id].get("questions", [])
+        change = {}
+        if old_sections[section_id].get("title") != new_sections[section_id].get("title"):
+            change["title"] = {"old": old_sections[section_id].get("title"), "new": new_sections[section_id].get("title")}
+        added = [q for q in new_q if q not in old_q]
+        removed = [q for q in old_q if q not in new_q]
+        if added:
+            change["questions_added"] = added
+        if removed:
+            change["questions_removed"] = removed
+        if not added and not removed and old_q != new_q:
+            change["questions_reordered"] = True
+        if change:
+            changed[section_id] = change
+    if changed:
+        delta["sections_changed"] = changed
+    if list(old_sections) != list(new_sections) and not delta["sections_added"] and not delta["sections_removed"]:
+        delta["sections_reordered"] = True
+    return {k: v for k, v in delta.items() if v not in ([], {})}
+
+
+def diff(old_path, new_path):
+    old, new = scan(old_path), scan(new_path)
+    added, removed, modified, unchanged = [], [], [], 0
+    for key, new_entries in new.items():
+        same, pairs, added_offsets, removed_offsets = pair_entries(old.pop(key, []), new_entries)
+        unchanged += same
+        for old_offset, new_offset in pairs:
+            modified.append(plan_delta(read_at(old_path, old_offset), read_at(new_path, new_offset)))
+        added.extend(request_text(get_user_message(read_at(new_path, offset))) for offset in added_offsets)
+        removed.extend(request_text(get_user_message(read_at(old_path, offset))) for offset in removed_offsets)
+    for entries in old.values():
+        removed.extend(request_text(get_user_message(read_at(old_path, offset))) for _, offset in entries)
+    return {
+        "summary": {"added": len(added), "removed": len(removed), "modified": len(modified), "unchanged": unchanged},
+        "added": added,
+        "removed": removed,
+        "modified": modified,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Record-level diff of two training JSONL files.")
+    parser.add_argument("old")
+    parser.add_argument("new")
+    parser.add_argument("--json-out", default=None, help="write the full diff as JSON")
+    parser.add_argument("--show", type=int, default=10, help="entries to print per category")
+    args = parser.parse_args()
+
+    result = diff(args.old, args.new)
+    summary = result["summary"]
+    print(f"{summary['added']} added, {summary['removed']} removed, "
+          f"{summary['modified']} modified, {summary['unchanged']} unchanged")
+    for name in ("added", "removed"):
+        for request in result[name][:args.show]:
+            print(f"  {'+' if name == 'added' else '-'} {request}")
+    for delta in result["modified"][:args.show]:
+        print(f"  ~ {delta['request']}")
+        for section_id in delta.get("sections_added", []):
+            print(f"      + section {section_id}")
+        for section_id in delta.get("sections_removed", []):
+            print(f"      - section {section_id}")
+        for section_id, change in delta.get("sections_changed", {}).items():
+            print(f"      ~ section {section_id}: +{len(change.get('questions_added', []))} "
+                  f"-{len(change.get('questions_removed', []))} questions")
+    if args.json_out:
+        with open(args.json_out, "w", encoding="utf-8") as f:
+            json.dump(result, f, ensure_ascii=False, indent=2)
+
+
+if __name__ == "__main__":
+    main()
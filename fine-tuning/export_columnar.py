@@ -0,0 +1,198 @@
+#!/usr/bin/env python3
+"""
+Export training JSONL as Arrow IPC and Parquet for column-wise analysis.
+
+Each record becomes one row: source, message roles, system/user text, the
+assistant plan fields, flattened section and question lists and a stable
+record hash. Repeated strings (source, roles, system prompt, section ids) are
+dictionary-encoded with one growing dictionary per column, so batches are
+written as dictionary deltas instead of repeating the text.
+
+Readers memory-map the Arrow file and touch only the columns they select:
+
+    from export_columnar import open_corpus
+    table = open_corpus("merged_training_data.arrow", columns=["source", "section_ids"])
+
+Usage:
+    python export_columnar.py merged=merged_training_data.jsonl eval=eval_data_rft.jsonl -o corpus
+"""
+import argparse
+import hashlib
+import json
+
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+from canonicalize_prompts import request_text
+from generate_merged_training import get_plan, get_plan_sections, parse_source_spec, read_jsonl
+
+DICT_STRING = pa.dictionary(pa.int32(), pa.string())
+
+SCHEMA = pa.schema([
+    ("source", DICT_STRING),
+    ("record_hash", pa.binary(20)),
+    ("message_roles", pa.list_(DICT_STRING)),
+    ("system_prompt", DICT_STRING),
+    ("user_text", pa.string()),
+    ("request_text", pa.string()),
+    ("has_plan", pa.bool_()),
+    ("chat_response", pa.string()),
+    ("plan_title", pa.string()),
+    ("section_ids", pa.list_(DICT_STRING)),
+    ("section_titles", pa.list_(DICT_STRING)),
+    ("questions", pa.list_(pa.string())),
+    ("question_section", pa.list_(pa.int16())),
+])
+DICT_COLUMNS = ("source", "system_prompt")
+DICT_LIST_COLUMNS = ("message_roles", "section_ids", "section_titles")
+
+
+def record_hash(example):
+    """Stable SHA-1 over the canonical JSON form of a record."""
+    canonical = json.dumps(example, ensure_ascii=False, sort_keys=True, separators=(",", ":"))
+    return hashlib.sha1(canonical.encode("utf-8")).digest()
+
+
+def flatten_record(example, source):
+    """Turn one chat example into a flat row dict matching SCHEMA."""
+    messages = example["messages"]
+    by_role = {}
+    for msg in messages:
+        by_role[msg["role"]] = msg["content"]
+
+    plan = get_plan(example)
+    research = plan.get("researchPlan") if plan else None
+    research = research if isinstance(research, dict) else {}
+    sections = get_plan_sections(plan)
+
+    questions, question_section = [], []
+    for i, section in enumerate(sections):
+        for question in section.get("questions", []):
+            questions.append(question)
+            question_section.append(i)
+
+    user_text = by_role.get("user", "")
+    return {
+        "source": source,
+        "record_hash": record_hash(example),
+        "message_roles": [m["role"] for m in messages],
+        "system_prompt": by_role.get("system"),
+        "user_text": user_text,
+        "request_text": request_text(user_text),
+        "has_plan": plan is not None,
+        "chat_response": plan.get("chatResponse") if plan else None,
+        "plan_title": research.get("title"),
+        "section_ids": [s.get("id", "") for s in sections],
+        "section_titles": [s.get("title", "") for s in sections],
+        "questions": questions,
+        "question_section": question_section,
+    }
+
+
+class DictionaryBuilder:
+    """Append-only string dictionary shared by every batch of one column.
+
+    Only the values first seen since the previous batch are converted to
+    Arrow and appended, so the dictionary each batch carries extends the last
+    one and the IPC writer emits just those values as a delta.
+    """
+
+    def __init__(self):
+        self.index = {}
+        self.new_values = []
+        self.dictionary = pa.array([], type=pa.string())
+
+    def encode(self, value):
+        if value is None:
+            return None
+        code = self.index.get(value)
+        if code is None:
+            code = self.index[value] = len(self.index)
+            self.new_values.append(value)
+        return code
+
+    def array(self, codes):
+        if self.new_values:
+            delta = pa.array(self.new_values, type=pa.string())
+            self.dictionary = pa.concat_arrays([self.dictionary, delta])
+            self.new_values = []
+        return pa.DictionaryArray.from_arrays(pa.array(codes, type=pa.int32()), self.dictionary)
+
+
+def build_batch(rows, dictionaries):
+    """Build a RecordBatch from row dicts, reusing the column dictionaries."""
+    columns = []
+    for field in SCHEMA:
+        name = field.name
+        values = [row[name] for row in rows]
+        if name in DICT_COLUMNS:
+            columns.append(dictionaries[name].array([dictionaries[name].encode(v) for v in values]))
+        elif name in DICT_LIST_COLUMNS:
+            offsets, codes = [0], []
+            for items in values:
+                codes.extend(dictionaries[name].encode(v) for v in items)
+                offsets.append(len(codes))
+            columns.append(pa.ListArray.from_arrays(pa.array(offsets, type=pa.int32()), dictionaries[name].array(codes)))
+        else:
+            columns.append(pa.array(values, type=field.type))
+    return pa.RecordBatch.from_arrays(columns, schema=SCHEMA)
+
+
+def export(inputs, output_prefix, batch_size=4096, compression="zstd"):
+    """Stream inputs into <prefix>.arrow and <prefix>.parquet; returns the row count."""
+    dictionaries = {name: DictionaryBuilder() for name in DICT_COLUMNS + DICT_LIST_COLUMNS}
+    options = pa.ipc.IpcWriteOptions(emit_dictionary_deltas=True)
+    total = 0
+    with pa.OSFile(output_prefix + ".arrow", "wb") as sink, \
+            pa.ipc.new_file(sink, SCHEMA, options=options) as arrow_writer, \
+            pq.ParquetWriter(output_prefix + ".parquet", SCHEMA, compression=compression,
+                             use_dictionary=list(DICT_COLUMNS + DICT_LIST_COLUMNS)) as parquet_writer:
+        rows = []
+        for spec in inputs:
+            source, path = parse_source_spec(spec)
+            for example in read_jsonl(path):
+                rows.append(flatten_record(example, source))
+                if len(rows) >= batch_size:
+                    batch = build_batch(rows, dictionaries)
+                    arrow_writer.write_batch(batch)
+                    parquet_writer.write_batch(batch)
+                    total += len(rows)
+                    rows = []
+        if rows:
+            batch = build_batch(rows, dictionaries)
+            arrow_writer.write_batch(batch)
+            parquet_writer.write_batch(batch)
+            total += len(rows)
+    return total
+
+
+def open_corpus(path, columns=None):
+    """Open an exported corpus, memory-mapped, reading only the given columns."""
+    if path.endswith(".parquet"):
+        return pq.read_table(path, columns=columns, memory_map=True)
+    reader = pa.ipc.open_file(pa.memory_map(path, "r"))
+    table = reader.read_all()
+    return table.select(columns) if columns else table
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Export training JSONL to Arrow IPC and Parquet.")
+    parser.add_argument("inputs", nargs="+", help="JSONL files, optionally as source=path")
+    parser.add_argument("-o", "--output", required=True, help="output prefix (writes .arrow and .parquet)")
+    parser.add_argument("--batch-size", type=int, default=4096)
+    parser.add_argument("--compression", default="zstd", help="Parquet codec")
+    args = parser.parse_args()
+
+    total = export(args.inputs, args.output, args.batch_size, args.compression)
+    print(f"Exported {total} records to {args.output}.arrow and {args.output}.parquet")
+    table = open_corpus(args.output + ".arrow", columns=["source", "has_plan"])
+    sources = table.column("source").to_pylist()
+    plans = table.column("has_plan").to_pylist()
+    for source in sorted(set(sources)):
+        count = sources.count(source)
+        with_plan = sum(1 for s, p in zip(sources, plans) if s == source and p)
+        print(f"  - {source}: {count} records ({with_plan} with plans)")
+
+
+if __name__ == "__main__":
+    main()
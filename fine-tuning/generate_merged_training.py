@@ -4,6 +4,13 @@ Generate comprehensive merged training data for Searcho AI RFT fine-tuning.
 Merges Şimal's examples + existing RFT prompts + new mobile banking examples.
 """
 import json
+import os
+
+from checkpoint import CheckpointedWriter, iter_jsonl_offsets
+
+SIMAL_PATH = "/Users/fibabanka/Searcho/search-ai-labs/fine-tuning/(Şimal)training_data.jsonl"
+RFT_PATH = "/Users/fibabanka/Searcho/search-ai-labs/fine-tuning/searcho_training_data_rft.jsonl"
+OUTPUT_PATH = "/Users/fibabanka/Searcho/search-ai-labs/fine-tuning/merged_training_data.jsonl"
 
 SYSTEM_PROMPT = "Sen Searcho AI araştırma planlaması asistanısın. Kullanıcının araştırma talebini analiz et ve yapılandırılmış bir araştırma planı oluştur. SADECE JSON formatında yanıt ver."
 
@@ -33,25 +40,64 @@ def make_prompt_only(user_msg):
         ]
     }
 
-def get_simal_examples():
-    """Load Şimal's 10 complete examples from file."""
-    examples = []
-    with open("/Users/fibabanka/Searcho/search-ai-labs/fine-tuning/(Şimal)training_data.jsonl", "r", encoding="utf-8") as f:
+def read_jsonl(path):
+    """Yield parsed records from a JSONL file, skipping blank lines."""
+    with open(path, "r", encoding="utf-8") as f:
         for line in f:
             line = line.strip()
             if line:
-                examples.append(json.loads(line))
-    return examples
+                yield json.loads(line)
+
+def get_user_message(example):
+    """Return the last user turn of an example, or an empty string."""
+    user_msg = ""
+    for msg in example["messages"]:
+        if msg["role"] == "user":
+            user_msg = msg["content"]
+    return user_msg
+
+def get_plan(example):
+    """Decode the assistant plan of a complete example, or None."""
+    for msg in example["messages"]:
+        if msg["role"] == "assistant":
+            try:
+                plan = json.loads(msg["content"])
+            except ValueError:
+                return None
+            return plan if isinstance(plan, dict) else None
+    return None
+
+def get_plan_sections(plan):
+    """Return the sections list of a decoded plan (empty when malformed)."""
+    research = plan.get("researchPlan") if plan else None
+    sections = research.get("sections") if isinstance(research, dict) else None
+    return [s for s in sections if isinstance(s, dict)] if isinstance(sections, list) else []
+
+def parse_source_spec(spec):
+    """Split a 'source=path' input spec; bare paths are named after the file stem."""
+    if "=" in spec and not os.path.exists(spec):
+        name, path = spec.split("=", 1)
+        return name, path
+    return os.path.splitext(os.path.basename(spec))[0], spec
+
+def count_complete_and_prompt_only(examples):
+    """Count complete (3-message) and prompt-only (2-message) examples in one pass."""
+    complete = prompt_only = 0
+    for e in examples:
+        n = len(e["messages"])
+        if n == 3:
+            complete += 1
+        elif n == 2:
+            prompt_only += 1
+    return complete, prompt_only
+
+def get_simal_examples():
+    """Load Şimal's 10 complete examples from file."""
+    return list(read_jsonl(SIMAL_PATH))
 
 def get_existing_rft_prompts():
     """Load existing RFT prompts."""
-    examples = []
-    with open("/Users/fibabanka/Searcho/search-ai-labs/fine-tuning/searcho_training_data_rft.jsonl", "r", encoding="utf-8") as f:
-        for line in f:
-            line = line.strip()
-            if line:
-                examples.append(json.loads(line))
-    return examples
+    return list(read_jsonl(RFT_PATH))
 
 def get_new_mobile_banking_examples():
     """Generate comprehensive mobile banking training examples with complete responses."""
@@ -1124,57 +1170,58 @@ def get_new_mobile_banking_examples():
     return examples
 
 
-def main():
-    all_examples = []
+def dedup_key_of(example):
+    """Dedup key used by main(): the lowercased, stripped user message."""
+    return get_user_message(example).strip().lower()
+
+def main(output_path=OUTPUT_PATH, shard_size=1000):
+    # Output goes through checkpointed shards; an interrupted run resumes
+    # from the journaled input positions instead of starting over.
+    writer = CheckpointedWriter(output_path, shard_size)
+    if writer.resumed:
+        print(f"Resuming from checkpoint: {writer.state['records']} examples already written")
+
+    def add(example, source, position):
+        writer.mark_seen(dedup_key_of(example))
+        writer.count(f"{source}_written")
+        n = len(example["messages"])
+        writer.count("complete" if n == 3 else "prompt_only" if n == 2 else "other")
+        writer.write(example, source, position)
 
     # 1. Şimal's complete examples
-    simal = get_simal_examples()
-    print(f"Loaded {len(simal)} Şimal examples (complete with assistant responses)")
-    all_examples.extend(simal)
+    if not writer.is_done("simal"):
+        for example, offset in iter_jsonl_offsets(SIMAL_PATH, writer.position("simal")):
+            add(example, "simal", offset)
+        writer.mark_done("simal")
+    print(f"Loaded {writer.counters.get('simal_written', 0)} Şimal examples (complete with assistant responses)")
 
     # 2. New comprehensive mobile banking examples
     new_banking = get_new_mobile_banking_examples()
-    complete_count = sum(1 for e in new_banking if len(e["messages"]) == 3)
-    prompt_count = sum(1 for e in new_banking if len(e["messages"]) == 2)
+    if not writer.is_done("new_banking"):
+        for i in range(writer.position("new_banking"), len(new_banking)):
+            add(new_banking[i], "new_banking", i + 1)
+        writer.mark_done("new_banking")
+    complete_count, prompt_count = count_complete_and_prompt_only(new_banking)
     print(f"Generated {len(new_banking)} new mobile banking examples ({complete_count} complete, {prompt_count} prompt-only)")
-    all_examples.extend(new_banking)
 
     # 3. Existing RFT prompts (filter out duplicates based on user message)
-    existing_user_msgs = set()
-    for e in all_examples:
-        for msg in e["messages"]:
-            if msg["role"] == "user":
-                existing_user_msgs.add(msg["content"].strip().lower())
-
-    rft = get_existing_rft_prompts()
-    added = 0
-    skipped = 0
-    for e in rft:
-        user_msg = ""
-        for msg in e["messages"]:
-            if msg["role"] == "user":
-                user_msg = msg["content"].strip().lower()
-        if user_msg not in existing_user_msgs:
-            all_examples.append(e)
-            existing_user_msgs.add(user_msg)
-            added += 1
-        else:
-            skipped += 1
-    print(f"Added {added} existing RFT prompts, skipped {skipped} duplicates")
-
-    # Write merged file
-    output_path = "/Users/fibabanka/Searcho/search-ai-labs/fine-tuning/merged_training_data.jsonl"
-    with open(output_path, "w", encoding="utf-8") as f:
-        for example in all_examples:
-            f.write(json.dumps(example, ensure_ascii=False) + "\n")
-
-    print(f"\nTotal: {len(all_examples)} training examples written to {output_path}")
+    if not writer.is_done("rft"):
+        for example, offset in iter_jsonl_offsets(RFT_PATH, writer.position("rft")):
+            if writer.seen(dedup_key_of(example)):
+                writer.count("rft_skipped")
+                writer.advance("rft", offset)
+            else:
+                add(example, "rft", offset)
+        writer.mark_done("rft")
+    print(f"Added {writer.counters.get('rft_written', 0)} existing RFT prompts, skipped {writer.counters.get('rft_skipped', 0)} duplicates")
+
+    # Assemble the merged file atomically from the committed shards
+    total = writer.finish()
+    print(f"\nTotal: {total} training examples written to {output_path}")
 
     # Stats
-    complete_total = sum(1 for e in all_examples if len(e["messages"]) == 3)
-    prompt_total = sum(1 for e in all_examples if len(e["messages"]) == 2)
-    print(f"  - Complete (with assistant response): {complete_total}")
-    print(f"  - Prompt-only (for RFT): {prompt_total}")
+    print(f"  - Complete (with assistant response): {writer.counters.get('complete', 0)}")
+    print(f"  - Prompt-only (for RFT): {writer.counters.get('prompt_only', 0)}")
 
 
 if __name__ == "__main__":
@@ -0,0 +1,319 @@
+#!/usr/bin/env python3
+"""
+CPU-only domain classifier for planner requests, for routing before any model
+call (pick few-shot examples or a plan template per domain, or skip the large
+model for a known domain).
+
+Labels come from the corpus itself:
+
+  - every complete example in get_new_mobile_banking_examples() gets the
+    category banner it is written under ("# 13. KREDİ KARTI" -> kredi_karti),
+    read from the function's source in order, and
+  - examples from other JSONL files get the label their plan's section ids
+    vote for, counting only ids that appear under a single banner (shared
+    ids such as "improvements" carry no vote). Prompt-only examples (the RFT
+    prompts) have no sections and stay unlabeled.
+
+The model is a multinomial logistic regression over hashed features (stemmed
+words, word bigrams and character 3/4-grams of the folded request), trained
+with NumPy. Plan titles and questions of a labeled example are added as
+lower-weight samples so a domain with one example still has vocabulary.
+
+The corpus has no out-of-domain requests, so instead of an "other" class the
+model abstains: route() returns OTHER unless the top probability reaches a
+threshold calibrated by cross-validation, where whole examples (request and
+plan) are held out, to reach --min-precision on held-out requests. Unknown
+domains and unfamiliar phrasings fall below it and go to the large model.
+
+The exported .npz keeps only the hash buckets seen in training (float16
+weights), loads in a few milliseconds without pickle, and a request is
+classified with one CRC32 per feature and a small gather.
+
+Usage:
+    python intent_classifier.py train --inputs merged_training_data.jsonl -o intent_model.npz --min-precision 0.9
+    python intent_classifier.py classify --model intent_model.npz "Kredi kartı başvuru sürecini araştıralım"
+"""
+import argparse
+import inspect
+import re
+import time
+import zlib
+from collections import Counter
+
+import numpy as np
+
+import generate_merged_training
+from canonicalize_prompts import fold, request_text
+from generate_merged_training import dedup_key_of, get_plan, get_plan_sections, get_user_message, read_jsonl
+from plan_cache_service import STOPWORDS, stem
+
+DEFAULT_BUCKETS = 1 << 18
+OTHER = "other"
+AUX_WEIGHT = 0.3
+_BANNER = re.compile(r"^\s*#\s*\d+\.\s*(.+?)\s*$")
+_WORD = re.compile(r"\w+", re.UNICODE)
+
+
+def banner_label(banner):
+    """'KMH - KREDİLİ MEVDUAT HESABI (OVERDRAFT)' -> 'kmh'."""
+    name = re.split(r"\(| - ", banner)[0]
+    return "_".join(_WORD.findall(fold(name).replace("&", " ")))
+
+
+def curated_labels():
+    """(example, label) for each complete example in get_new_mobile_banking_examples()."""
+    labels, label = [], None
+    for line in inspect.getsource(generate_merged_training.get_new_mobile_banking_examples).splitlines():
+        banner = _BANNER.match(line)
+        if banner:
+            label = banner_label(banner.group(1))
+        elif "examples.append(make_complete(" in line:
+            labels.append(label)
+    examples = [e for e in generate_merged_training.get_new_mobile_banking_examples() if get_plan(e)]
+    if len(examples) != len(labels):
+        raise ValueError(f"{len(labels)} make_complete calls under banners but {len(examples)} complete examples")
+    return list(zip(examples, labels))
+
+
+def section_votes(labeled):
+    """Section id -> label, for ids that only ever appear under one label."""
+    seen = {}
+    for example, label in labeled:
+        for section in get_plan_sections(get_plan(example)):
+            seen.setdefault(section.get("id"), set()).add(label)
+    return {sid: labels.pop() for sid, labels in seen.items() if sid and len(labels) == 1}
+
+
+def vote_label(example, votes):
+    """Majority label of an example's section ids, or None without a clear winner."""
+    counts = Counter(votes[s.get("id")] for s in get_plan_sections(get_plan(example)) if s.get("id") in votes)
+    ranked = counts.most_common(2)
+    if not ranked or (len(ranked) > 1 and ranked[0][1] == ranked[1][1]):
+        return None
+    return ranked[0][0]
+
+
+def labeled_examples(paths=()):
+    """Curated examples with banner labels, then voted examples from paths (first per request wins)."""
+    labeled = curated_labels()
+    votes = section_votes(labeled)
+    seen = {dedup_key_of(example) for example, _ in labeled}
+    stats = {"curated": len(labeled), "voted": 0, "unlabeled": 0}
+    for path in paths:
+        for example in read_jsonl(path):
+            key = dedup_key_of(example)
+            if key in seen:
+                continue
+            seen.add(key)
+            label = vote_label(example, votes) if get_plan(example) else None
+            if label is None:
+                stats["unlabeled"] += 1
+                continue
+            labeled.append((example, label))
+            stats["voted"] += 1
+    return labeled, stats
+
+
+def feature_names(text):
+    """Stemmed words, word bigrams and char 3/4-grams of a folded request."""
+    words = [w for w in _WORD.findall(fold(text)) if w not in STOPWORDS and not w.isdigit()]
+    stems = [stem(w) for w in words]
+    names = ["w:" + s for s in stems]
+    names += [f"b:{a} {b}" for a, b in zip(stems, stems[1:])]
+    for word in words:
+        padded = f" {word} "
+        names += ["c:" + padded[i:i + n] for n in (3, 4) for i in range(len(padded) - n + 1)]
+    return names
+
+
+def featurize(text, buckets):
+    """(bucket indices, L2-normalized counts) of a text's hashed features."""
+    hashed = [zlib.crc32(name.encode("utf-8")) & (buckets - 1) for name in feature_names(text)]
+    if not hashed:
+        return np.zeros(0, np.int64), np.zeros(0, np.float32)
+    indices, counts = np.unique(np.array(hashed, np.int64), return_counts=True)
+    values = counts.astype(np.float32)
+    return indices, values / np.linalg.norm(values)
+
+
+def training_samples(labeled):
+    """(text, label, weight, group) rows: the request at full weight, plan text at AUX_WEIGHT."""
+    samples = []
+    for group, (example, label) in enumerate(labeled):
+        samples.append((request_text(get_user_message(example)), label, 1.0, group))
+        plan = get_plan(example)
+        if plan is None:
+            continue
+        samples.append((plan["researchPlan"].get("title", ""), label, AUX_WEIGHT, group))
+        for section in get_plan_sections(plan):
+            for question in section.get("questions", []):
+                if isinstance(question, str):
+                    samples.append((question, label, AUX_WEIGHT, group))
+    return samples
+
+
+def fit(samples, buckets=DEFAULT_BUCKETS, epochs=300, learning_rate=30.0, l2=1e-4):
+    """Full-batch gradient descent on softmax regression; returns a DomainClassifier."""
+    labels = sorted({label for _, label, _, _ in samples})
+    rows, indices, values, targets, weights = [], [], [], [], []
+    for text, label, weight, _ in samples:
+        idx, val = featurize(text, buckets)
+        if not len(idx):
+            continue
+        rows.append(np.full(len(idx), len(targets)))
+        indices.append(idx)
+        values.append(val)
+        targets.append(labels.index(label))
+        weights.append(weight)
+    used, columns = np.unique(np.concatenate(indices), return_inverse=True)
+    rows, values = np.concatenate(rows), np.concatenate(values)[:, None]
+    targets, weights = np.array(targets), np.array(weights, np.float32)
+    n, k = len(targets), len(labels)
+    onehot = np.eye(k, dtype=np.float32)[targets]
+    sample_weights = (weights / weights.sum())[:, None]
+
+    # Every sample and every used bucket has at least one entry, so both
+    # sparse products are segment sums with np.add.reduceat.
+    row_starts = np.flatnonzero(np.r_[True, rows[1:] != rows[:-1]])
+    by_column = np.argsort(columns, kind="stable")
+    column_starts = np.flatnonzero(np.r_[True, np.diff(columns[by_column]) != 0])
+
+    w = np.zeros((len(used), k), np.float32)
+    b = np.zeros(k, np.float32)
+    for _ in range(epochs):
+        logits = np.add.reduceat(w[columns] * values, row_starts, axis=0) + b
+        logits -= logits.max(axis=1, keepdims=True)
+        probs = np.exp(logits)
+        probs /= probs.sum(axis=1, keepdims=True)
+        delta = (probs - onehot) * sample_weights
+        grad = np.add.reduceat((delta[rows] * values)[by_column], column_starts, axis=0)
+        w -= learning_rate * (grad + l2 * w)
+        b -= learning_rate * delta.sum(axis=0)
+    return DomainClassifier(labels, used, w, b, buckets)
+
+
+class DomainClassifier:
+    """Hashed-feature linear model over the buckets seen in training."""
+
+    def __init__(self, labels, buckets_used, weights, bias, buckets, threshold=0.0):
+        self.labels = list(labels)
+        self.threshold = float(threshold)
+        self.buckets = buckets
+        self.buckets_used = np.asarray(buckets_used, np.int64)
+        self.weights = np.asarray(weights, np.float32)
+        self.bias = np.asarray(bias, np.float32)
+        self.slots = np.full(buckets, -1, np.int32)
+        self.slots[self.buckets_used] = np.arange(len(self.buckets_used), dtype=np.int32)
+
+    def scores(self, text):
+        idx, val = featurize(text, self.buckets)
+        slots = self.slots[idx]
+        known = slots >= 0
+        logits = self.bias + val[known] @ self.weights[slots[known]]
+        probs = np.exp(logits - logits.max())
+        return probs / probs.sum()
+
+    def classify(self, text, top=1):
+        """[(label, probability)] for a request, best first."""
+        probs = self.scores(request_text(text))
+        order = np.argsort(-probs)[:top]
+        return [(self.labels[i], float(probs[i])) for i in order]
+
+    def route(self, text):
+        """The request's label, or OTHER when the model is not confident enough to route it."""
+        label, probability = self.classify(text)[0]
+        return label if probability >= self.threshold else OTHER
+
+    def save(self, path):
+        np.savez(path, labels=np.array(self.labels), buckets_used=self.buckets_used.astype(np.int32),
+                 weights=self.weights.astype(np.float16), bias=self.bias, buckets=np.array(self.buckets),
+                 threshold=np.array(self.threshold))
+
+    @classmethod
+    def load(cls, path):
+        with np.load(path, allow_pickle=False) as data:
+            return cls(data["labels"].tolist(), data["buckets_used"], data["weights"], data["bias"],
+                       int(data["buckets"]), float(data["threshold"]))
+
+
+def cross_validate(samples, folds, **params):
+    """Held-out (probability, correct) per request, with its whole example (plan included) held out."""
+    groups = sorted({group for *_, group in samples})
+    predictions = []
+    for fold_index in range(folds):
+        held = set(groups[fold_index::folds])
+        model = fit([s for s in samples if s[3] not in held], **params)
+        for text, label, weight, group in samples:
+            if group in held and weight == 1.0:
+                predicted, probability = model.classify(text)[0]
+                predictions.append((probability, predicted == label))
+    return predictions
+
+
+def calibrate_threshold(predictions, min_precision):
+    """Lowest probability threshold whose accepted predictions reach min_precision (inf if none does)."""
+    threshold = float("inf")
+    correct = 0
+    for accepted, (probability, ok) in enumerate(sorted(predictions, reverse=True), 1):
+        correct += ok
+        if correct / accepted >= min_precision:
+            threshold = probability
+    return threshold
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Train or run the request domain classifier.")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    train_cmd = commands.add_parser("train", help="train on the curated examples (and voted inputs)")
+    train_cmd.add_argument("--inputs", nargs="*", default=[], help="JSONL files labeled by section-id votes")
+    train_cmd.add_argument("-o", "--output", required=True, help="model .npz path")
+    train_cmd.add_argument("--buckets", type=int, default=DEFAULT_BUCKETS, help="hash space (power of two)")
+    train_cmd.add_argument("--epochs", type=int, default=300)
+    train_cmd.add_argument("--folds", type=int, default=5, help="cross-validation folds for the abstain threshold")
+    train_cmd.add_argument("--min-precision", type=float, default=0.9, help="held-out precision of routed requests")
+
+    classify_cmd = commands.add_parser("classify", help="classify requests")
+    classify_cmd.add_argument("requests", nargs="+")
+    classify_cmd.add_argument("--model", required=True)
+    classify_cmd.add_argument("--top", type=int, default=3)
+    args = parser.parse_args()
+
+    if args.command == "train":
+        if args.buckets & (args.buckets - 1):
+            parser.error("--buckets must be a power of two")
+        labeled, stats = labeled_examples(args.inputs)
+        samples = training_samples(labeled)
+        print(f"{len(labeled)} labeled examples ({stats['curated']} curated, {stats['voted']} voted, "
+              f"{stats['unlabeled']} unlabeled skipped), {len(samples)} samples, "
+              f"{len({label for _, label in labeled})} labels")
+        if args.folds < 2:
+            parser.error("--folds must be at least 2 to calibrate the abstain threshold")
+        params = {"buckets": args.buckets, "epochs": args.epochs}
+        predictions = cross_validate(samples, args.folds, **params)
+        threshold = calibrate_threshold(predictions, args.min_precision)
+        routed = [ok for probability, ok in predictions if probability >= threshold]
+        print(f"{args.folds}-fold held-out accuracy: {sum(ok for _, ok in predictions) / len(predictions):.1%}; "
+              f"threshold {threshold:.2f} routes {len(routed)}/{len(predictions)} requests "
+              f"at {sum(routed) / max(len(routed), 1):.1%} precision")
+        started = time.perf_counter()
+        model = fit(samples, **params)
+        model.threshold = threshold
+        model.save(args.output)
+        print(f"Trained in {time.perf_counter() - started:.2f}s: {len(model.buckets_used)} buckets -> {args.output}")
+    else:
+        started = time.perf_counter()
+        model = DomainClassifier.load(args.model)
+        print(f"Loaded {args.model} in {(time.perf_counter() - started) * 1000:.1f}ms")
+        for request in args.requests:
+            started = time.perf_counter()
+            ranked = model.classify(request, args.top)
+            elapsed = (time.perf_counter() - started) * 1e6
+            route = ranked[0][0] if ranked[0][1] >= model.threshold else OTHER
+            print(f"{request}  -> {route} ({elapsed:.0f}µs)")
+            for label, probability in ranked:
+                print(f"  - {label}: {probability:.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,245 @@
+#!/usr/bin/env python3
+"""
+Replay eval/training prompts against a planner endpoint and report latency.
+
+Two load models:
+  - open loop (--qps): requests start on a fixed schedule whether or not
+    earlier ones finished; latency is measured from the scheduled start so a
+    stalled server is not hidden by the client slowing down.
+  - closed loop (--concurrency): N workers each send the next request as soon
+    as their previous one completes.
+
+Two payload shapes:
+  - chat: OpenAI-compatible /chat/completions (the fine-tuned model), checked
+    against response_format.json.
+  - planner: the ai-enhanced-planner edge function body ({"message": ...}),
+    checked against the required fields of its final payload.
+
+Usage:
+    python load_test_planner.py eval_data_rft.jsonl --endpoint http://localhost:8089/v1/chat/completions --qps 5 --stream
+"""
+import argparse
+import asyncio
+import json
+import time
+
+from canonicalize_prompts import request_text
+from generate_merged_training import get_user_message, make_prompt_only, read_jsonl
+from openai_compat import DEFAULT_MODEL, auth_headers, chat_completion_body, iter_body, open_request
+from plan_schema import load_plan_schema, load_response_format, parse_plan, schema_errors
+
+# Top level of the edge function's final payload (its RESPONSE_FORMAT); the
+# brief and the fields the function adds on top are not pinned down here.
+PLANNER_FINAL_SCHEMA = {
+    "type": "object",
+    "properties": {
+        "reply": {"type": "string"},
+        "contextReadiness": {"type": "number"},
+        "isReady": {"type": "boolean"},
+        "brief": {"type": "object"},
+    },
+    "required": ["reply", "contextReadiness", "isReady", "brief"],
+}
+
+
+def load_requests(paths):
+    """Bare request texts from any example JSONL, in file order."""
+    requests = []
+    for path in paths:
+        for example in read_jsonl(path):
+            request = request_text(get_user_message(example))
+            if request:
+                requests.append(request)
+    return requests
+
+
+def build_payload(request, args, response_format):
+    if args.payload == "planner":
+        return {"message": request, "stream": args.stream}
+    return chat_completion_body(make_prompt_only(request)["messages"], args.model, response_format, stream=args.stream)
+
+
+def decode_chat(body, streamed):
+    """Assistant text from a chat completion body (SSE when streamed)."""
+    if not streamed:
+        return json.loads(body)["choices"][0]["message"]["content"]
+    parts = []
+    for line in body.decode("utf-8").splitlines():
+        if not line.startswith("data:"):
+            continue
+        data = line[5:].strip()
+        if data == "[DONE]":
+            break
+        delta = json.loads(data)["choices"][0].get("delta", {})
+        parts.append(delta.get("content") or "")
+    return "".join(parts)
+
+
+def planner_valid(body, streamed):
+    """A planner response is valid when it ends in a schema-valid final payload with a reply."""
+    if not streamed:
+        payload = json.loads(body)
+    else:
+        payload = None
+        for line in body.decode("utf-8").splitlines():
+            if line.strip():
+                event = json.loads(line)
+                if not isinstance(event, dict) or event.get("event") == "error":
+                    return False
+                if event.get("event") == "final":
+                    payload = event.get("data")
+    if payload is None or schema_errors(payload, PLANNER_FINAL_SCHEMA):
+        return False
+    return bool(payload["reply"].strip())
+
+
+async def send_one(request, args, response_format, schema, headers, scheduled=None):
+    """Issue one request; returns a sample dict with timings and outcome."""
+    started = time.perf_counter()
+    origin = scheduled if scheduled is not None else started
+    sample = {"ttfb": None, "error": None, "valid": False}
+
+    async def run():
+        status, response_headers, reader, writer = await open_request(
+            args.endpoint, build_payload(request, args, response_format), headers
+        )
+        chunks = []
+        try:
+            async for chunk in iter_body(reader, response_headers):
+                if args.stream and sample["ttfb"] is None:
+                    sample["ttfb"] = time.perf_counter() - origin
+                chunks.append(chunk)
+        finally:
+            writer.close()
+        return status, b"".join(chunks)
+
+    try:
+        status, body = await asyncio.wait_for(run(), args.timeout)
+        if not 200 <= status < 300:
+            sample["error"] = f"HTTP {status}"
+        elif args.payload == "planner":
+            sample["valid"] = planner_valid(body, args.stream)
+        else:
+            _, errors = parse_plan(decode_chat(body, args.stream), schema)
+            sample["valid"] = not errors
+    except asyncio.TimeoutError:
+        sample["error"] = "timeout"
+    except (OSError, ValueError, KeyError, IndexError, asyncio.IncompleteReadError) as e:
+        sample["error"] = type(e).__name__
+    sample["latency"] = time.perf_counter() - origin
+    return sample
+
+
+async def run_open_loop(requests, args, *context):
+    """Constant-QPS arrivals; in-flight requests are capped only by --max-inflight."""
+    interval = 1.0 / args.qps
+    gate = asyncio.Semaphore(args.max_inflight)
+    tasks = []
+    start = time.perf_counter()
+
+    async def fire(request, scheduled):
+        async with gate:
+            return await send_one(request, args, *context, scheduled=scheduled)
+
+    for i in range(args.requests):
+        scheduled = start + i * interval
+        delay = scheduled - time.perf_counter()
+        if delay > 0:
+            await asyncio.sleep(delay)
+        tasks.append(asyncio.create_task(fire(requests[i % len(requests)], scheduled)))
+    return await asyncio.gather(*tasks)
+
+
+async def run_closed_loop(requests, args, *context):
+    """Fixed concurrency; each worker pulls the next request when it is free."""
+    samples = []
+    counter = iter(range(args.requests))
+
+    async def worker():
+        for i in counter:
+            samples.append(await send_one(requests[i % len(requests)], args, *context))
+
+    await asyncio.gather(*(worker() for _ in range(args.concurrency)))
+    return samples
+
+
+def percentile(sorted_values, q):
+    """Nearest-rank percentile of an already sorted list."""
+    if not sorted_values:
+        return None
+    rank = max(int(round(q / 100.0 * len(sorted_values) + 0.5)) - 1, 0)
+    return sorted_values[min(rank, len(sorted_values) - 1)]
+
+
+def summarize(samples, elapsed):
+    latencies = sorted(s["latency"] for s in samples if s["error"] is None)
+    ttfbs = sorted(s["ttfb"] for s in samples if s["error"] is None and s["ttfb"] is not None)
+    errors = {}
+    for s in samples:
+        if s["error"]:
+            errors[s["error"]] = errors.get(s["error"], 0) + 1
+    ok = len(latencies)
+    return {
+        "requests": len(samples),
+        "elapsed_s": round(elapsed, 3),
+        "throughput_rps": round(len(samples) / elapsed, 2) if elapsed else 0.0,
+        "error_rate": round(1 - ok / len(samples), 4) if samples else 0.0,
+        "errors": errors,
+        "schema_valid_rate": round(sum(1 for s in samples if s["valid"]) / ok, 4) if ok else 0.0,
+        "latency_ms": {f"p{q}": round(percentile(latencies, q) * 1000, 1) for q in (50, 90, 99)} if latencies else {},
+        "ttfb_ms": {f"p{q}": round(percentile(ttfbs, q) * 1000, 1) for q in (50, 90, 99)} if ttfbs else {},
+    }
+
+
+def print_report(report, args):
+    mode = f"open loop @ {args.qps} qps" if args.qps else f"closed loop x{args.concurrency}"
+    print(f"\n{args.payload} endpoint {args.endpoint} ({mode}, stream={args.stream})")
+    print(f"  Requests: {report['requests']} in {report['elapsed_s']}s ({report['throughput_rps']} req/s)")
+    print(f"  Error rate: {report['error_rate']:.2%} {report['errors'] or ''}")
+    print(f"  Schema-valid rate (of successful): {report['schema_valid_rate']:.2%}")
+    for name in ("latency_ms", "ttfb_ms"):
+        if report[name]:
+            values = ", ".join(f"{k}={v}" for k, v in report[name].items())
+            print(f"  {name}: {values}")
+
+
+async def load_test(args):
+    requests = load_requests(args.inputs)
+    if not requests:
+        raise SystemExit("No requests found in inputs")
+    args.requests = args.requests or len(requests)
+    context = (load_response_format(), load_plan_schema(), auth_headers(args.api_key))
+    start = time.perf_counter()
+    if args.qps:
+        samples = await run_open_loop(requests, args, *context)
+    else:
+        samples = await run_closed_loop(requests, args, *context)
+    return summarize(samples, time.perf_counter() - start)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Replay prompts against a planner endpoint under load.")
+    parser.add_argument("inputs", nargs="+", help="eval or training JSONL files to replay")
+    parser.add_argument("--endpoint", required=True)
+    parser.add_argument("--payload", choices=("chat", "planner"), default="chat")
+    parser.add_argument("--model", default=DEFAULT_MODEL)
+    parser.add_argument("--api-key", default=None, help="defaults to $OPENAI_API_KEY")
+    mode = parser.add_mutually_exclusive_group()
+    mode.add_argument("--qps", type=float, default=0.0, help="open-loop arrival rate")
+    mode.add_argument("--concurrency", type=int, default=4, help="closed-loop workers")
+    parser.add_argument("--requests", type=int, default=0, help="total requests (default: one pass over inputs)")
+    parser.add_argument("--max-inflight", type=int, default=512, help="open-loop cap on concurrent connections")
+    parser.add_argument("--stream", action="store_true", help="request streamed responses and record TTFB")
+    parser.add_argument("--timeout", type=float, default=120.0)
+    parser.add_argument("--json-out", default=None, help="also write the report as JSON")
+    args = parser.parse_args()
+
+    report = asyncio.run(load_test(args))
+    print_report(report, args)
+    if args.json_out:
+        with open(args.json_out, "w", encoding="utf-8") as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+
+
+if __name__ == "__main__":
+    main()
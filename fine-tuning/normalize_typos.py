@@ -0,0 +1,327 @@
+#!/usr/bin/env python3
+"""
+Typo-tolerant normalization of research requests (symmetric delete spelling
+correction, as in SymSpell).
+
+The vocabulary is every word of the distinct corpus prompts, plan titles and
+section questions, with its frequency. Words seen at least --min-count times are
+trusted; every delete of up to two characters of a trusted word's prefix is
+precomputed and mapped back to the word. Correcting a token then only
+generates the token's own deletes and looks them up, so the cost does not
+depend on the vocabulary size. A token seen at most once ("Kullnıcı") is
+replaced by the closest trusted word ("Kullanıcı"), preferring missing
+diacritics over other edits and then the more frequent word.
+
+Rare is not wrong, so most rare tokens are left alone:
+
+  - words of the reference vocabulary (the restored words of turkish-text.ts
+    plus any --reference word lists) are never corrected;
+  - a token that analyses as a known stem plus Turkish suffixes
+    ("görünmüyor" = "görün" + "müyor") is a valid inflection, so only pure
+    diacritic restorations are applied to it;
+  - an edit may not add or remove the negation morpheme -m[ıiuü]-
+    ("kullanmıyor" never becomes "kullanıyor");
+  - a one-letter substitution often spells another real word
+    ("senet"/"sepet", "yarıyor"/"yaşıyor"), so only insertions, deletions,
+    transpositions and diacritic restorations are applied;
+  - a candidate must keep the token's first letter and last two letters
+    (diacritics aside), so "şifresi" is not "corrected" to "şifre".
+
+Numbers, short tokens and trusted tokens are never touched. The dictionary
+is saved as JSON with the size and mtime of the files it was built from and
+reused while they are unchanged.
+
+Usage:
+    python normalize_typos.py rft_training_data_final.jsonl -o normalized.jsonl \
+        --vocab merged_training_data.jsonl rft_training_data_final.jsonl --dictionary typos.symspell.json
+"""
+import argparse
+import json
+import os
+import re
+from collections import Counter
+
+from canonicalize_prompts import fold
+from generate_merged_training import get_plan, get_plan_sections, get_user_message, read_jsonl
+from plan_cache_service import SUFFIXES
+from restore_diacritics import load_lexicon, match_case
+
+MAGIC = b"SYMS2\n"
+_WORD = re.compile(r"[^\W\d_]+", re.UNICODE)
+# Folded suffixes for inflection analysis: the stemmer's, plus negated tenses and person endings.
+ANALYSIS_SUFFIXES = sorted(set(SUFFIXES) | {
+    "miyor", "muyor", "mayor", "meyor", "mez", "maz", "medi", "madi", "memis", "mamis", "mi", "mu",
+    "um", "im", "sun", "sin", "uz", "iz", "lar", "ler", "di", "du", "ti", "tu", "dik", "duk", "tik", "tuk",
+    "ecek", "acak", "yecek", "yacak", "ir", "ur", "ar", "er", "abil", "ebil", "yabil", "yebil",
+}, key=len, reverse=True)
+MIN_ANALYSIS_STEM = 3
+# Negation is never word-initial; "mü" in "müşteri" is not a morpheme.
+_NEGATION = re.compile(r"(?<=\w)m[ıiuü]")
+
+
+def tr_lower(text):
+    return text.replace("I", "ı").replace("İ", "i").lower()
+
+
+def corpus_texts(example):
+    """Texts of an example that feed the vocabulary: request, plan title, questions."""
+    yield get_user_message(example)
+    plan = get_plan(example)
+    if plan is None:
+        return
+    yield str((plan.get("researchPlan") or {}).get("title") or "")
+    for section in get_plan_sections(plan):
+        yield str(section.get("title") or "")
+        for question in section.get("questions") or []:
+            if isinstance(question, str):
+                yield question
+
+
+def reference_words(paths=()):
+    """Trusted reference vocabulary: the restored lexicon words plus words of the given text files."""
+    words = {tr_lower(w) for restored in load_lexicon().values() for w in _WORD.findall(restored)}
+    for path in paths:
+        with open(path, "r", encoding="utf-8") as f:
+            words.update(tr_lower(w) for w in _WORD.findall(f.read()))
+    return words
+
+
+def analyses(folded):
+    """Stems reachable by stripping up to three suffixes from a folded word (the word included)."""
+    found = {folded}
+    frontier = {folded}
+    for _ in range(3):
+        frontier = {w[:-len(suffix)] for w in frontier for suffix in ANALYSIS_SUFFIXES
+                    if w.endswith(suffix) and len(w) - len(suffix) >= MIN_ANALYSIS_STEM}
+        found |= frontier
+    return found
+
+
+def negations(word):
+    return len(_NEGATION.findall(word))
+
+
+def is_substitution(a, b):
+    return len(a) == len(b) and sum(x != y for x, y in zip(a, b)) == 1
+
+
+def edit_distance(a, b, limit):
+    """Optimal string alignment distance, or limit + 1 once it exceeds limit."""
+    if abs(len(a) - len(b)) > limit:
+        return limit + 1
+    previous2, previous = None, list(range(len(b) + 1))
+    for i in range(1, len(a) + 1):
+        current = [i] + [0] * len(b)
+        row_min = i
+        for j in range(1, len(b) + 1):
+            cost = a[i - 1] != b[j - 1]
+            value = min(previous[j] + 1, current[j - 1] + 1, previous[j - 1] + cost)
+            if previous2 is not None and i > 1 and j > 1 and a[i - 1] == b[j - 2] and a[i - 2] == b[j - 1]:
+                value = min(value, previous2[j - 2] + 1)
+            current[j] = value
+            row_min = min(row_min, value)
+        if row_min > limit:
+            return limit + 1
+        previous2, previous = previous, current
+    return previous[-1] if previous[-1] <= limit else limit + 1
+
+
+def deletes(word, distance):
+    """All strings reachable from word by deleting up to `distance` characters."""
+    found = {word}
+    frontier = {word}
+    for _ in range(distance):
+        frontier = {w[:i] + w[i + 1:] for w in frontier for i in range(len(w)) if len(w) > 1}
+        found |= frontier
+    return found
+
+
+class TypoNormalizer:
+    """Symmetric delete dictionary over a word-frequency vocabulary."""
+
+    def __init__(self, counts, max_distance=2, prefix_length=7, min_count=3, min_length=5, words=None, index=None,
+                 reference=None):
+        self.counts = counts
+        self.max_distance = max_distance
+        self.prefix_length = prefix_length
+        self.min_count = min_count
+        self.min_length = min_length
+        self.reference = reference_words() if reference is None else reference
+        self.cache = {}
+        if index is not None:
+            self.words, self.index = words, index
+        else:
+            self.words = sorted(w for w, c in counts.items() if c >= min_count)
+            self.index = {}
+            for word_id, word in enumerate(self.words):
+                for key in deletes(word[:prefix_length], max_distance):
+                    self.index.setdefault(key, []).append(word_id)
+        self.stems = set()
+        for word in set(self.words) | self.reference:
+            self.stems |= analyses(fold(word))
+
+    @classmethod
+    def build(cls, paths, reference=None, **options):
+        counts = Counter()
+        seen = set()
+        for path in paths:
+            for example in read_jsonl(path):
+                for text in corpus_texts(example):
+                    # a text repeated across files (merged copies of RFT prompts) counts once
+                    if text not in seen:
+                        seen.add(text)
+                        counts.update(tr_lower(w) for w in _WORD.findall(text))
+        return cls(dict(counts), reference=reference, **options)
+
+    def options(self):
+        return {"max_distance": self.max_distance, "prefix_length": self.prefix_length,
+                "min_count": self.min_count, "min_length": self.min_length}
+
+    def distance_for(self, word):
+        """Allowed edits for a word: one for short words, up to max_distance from 7 letters."""
+        return min(self.max_distance, 1 if len(word) < 7 else 2)
+
+    def is_inflection(self, word):
+        """Whether the folded word is a known stem plus suffixes (or a known word itself)."""
+        return not analyses(fold(word)).isdisjoint(self.stems)
+
+    def allowed(self, word, candidate, inflection):
+        """Meaning-preserving edits only; see the module docstring."""
+        if fold(candidate) == fold(word):
+            return True  # diacritics only
+        if inflection or negations(candidate) != negations(word):
+            return False
+        return not is_substitution(fold(word), fold(candidate))
+
+    def lookup(self, word):
+        """Best trusted replacement for a lowercase word (the word itself when none is better)."""
+        own_count = self.counts.get(word, 0)
+        if len(word) < self.min_length or own_count > 1 or word in self.reference:
+            return word
+        cached = self.cache.get(word)
+        if cached is not None:
+            return cached
+        limit = self.distance_for(word)
+        inflection = self.is_inflection(word)
+        best, best_rank = word, (limit + 1, limit + 1, 0)
+        checked = set()
+        for key in deletes(word[:self.prefix_length], limit):
+            for word_id in self.index.get(key, ()):
+                if word_id in checked:
+                    continue
+                checked.add(word_id)
+                candidate = self.words[word_id]
+                if fold(candidate[0] + candidate[-2:]) != fold(word[0] + word[-2:]):
+                    continue
+                distance = edit_distance(word, candidate, limit)
+                # never trade diacritics for a more frequent ASCII spelling ("sanırım" -> "sanirim")
+                if distance > limit or fold(candidate) == candidate == fold(word):
+                    continue
+                if not self.allowed(word, candidate, inflection):
+                    continue
+                rank = (edit_distance(fold(word), fold(candidate), limit), distance, -self.counts[candidate])
+                if rank < best_rank and self.counts[candidate] > own_count:
+                    best, best_rank = candidate, rank
+        self.cache[word] = best
+        return best
+
+    def correct(self, text):
+        """Correct every word of text, keeping its casing and everything between words."""
+        if not isinstance(text, str):
+            return text
+        return _WORD.sub(lambda m: self._correct_word(m.group(0)), text)
+
+    def _correct_word(self, token):
+        lowered = tr_lower(token)
+        corrected = self.lookup(lowered)
+        return token if corrected == lowered else match_case(token, corrected)
+
+    def save(self, path, sources):
+        """Persist the dictionary as JSON, tagged with the size and mtime of its source files."""
+        header = {"options": self.options(), "sources": [_stat(p) for p in sources]}
+        body = {"counts": self.counts, "words": self.words, "index": self.index}
+        tmp = path + ".tmp"
+        with open(tmp, "wb") as f:
+            f.write(MAGIC + json.dumps(header).encode("utf-8") + b"\n")
+            f.write(json.dumps(body, ensure_ascii=False, separators=(",", ":")).encode("utf-8"))
+        os.replace(tmp, path)
+
+    @classmethod
+    def load(cls, path, sources, reference=None, **options):
+        """Load a saved dictionary; returns None when missing, stale or built with other options."""
+        if not os.path.exists(path):
+            return None
+        with open(path, "rb") as f:
+            if f.readline() != MAGIC:
+                return None
+            header = json.loads(f.readline())
+            if header["sources"] != [_stat(p) for p in sources]:
+                return None
+            if any(header["options"].get(k) != v for k, v in options.items()):
+                return None
+            body = json.loads(f.read())
+        return cls(body["counts"], words=body["words"], index=body["index"], reference=reference, **header["options"])
+
+    @classmethod
+    def load_or_build(cls, path, sources, reference=None, **options):
+        normalizer = cls.load(path, sources, reference, **options) if path else None
+        if normalizer is None:
+            normalizer = cls.build(sources, reference, **options)
+            if path:
+                normalizer.save(path, sources)
+        return normalizer
+
+
+def _stat(path):
+    stat = os.stat(path)
+    return [os.path.abspath(path), stat.st_size, stat.st_mtime_ns]
+
+
+def correct_record(example, normalizer):
+    """Copy of an example with its user turns corrected; returns (example, changed words)."""
+    changes = []
+    messages = []
+    for msg in example["messages"]:
+        if msg["role"] == "user":
+            corrected = normalizer.correct(msg["content"])
+            if corrected != msg["content"]:
+                before, after = _WORD.findall(msg["content"]), _WORD.findall(corrected)
+                changes.extend((a, b) for a, b in zip(before, after) if a != b)
+                msg = dict(msg, content=corrected)
+        messages.append(msg)
+    return dict(example, messages=messages), changes
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Correct typos in the user turns of training JSONL files.")
+    parser.add_argument("inputs", nargs="+", help="JSONL files to correct")
+    parser.add_argument("-o", "--output", required=True)
+    parser.add_argument("--vocab", nargs="+", default=None, help="JSONL files to build the vocabulary from (default: inputs)")
+    parser.add_argument("--dictionary", default=None, help="saved dictionary path, reused while --vocab is unchanged")
+    parser.add_argument("--reference", nargs="*", default=[], help="word lists whose words are never corrected")
+    parser.add_argument("--min-count", type=int, default=3, help="occurrences before a word is trusted")
+    parser.add_argument("--max-distance", type=int, default=2)
+    args = parser.parse_args()
+
+    vocab = args.vocab or args.inputs
+    normalizer = TypoNormalizer.load_or_build(args.dictionary, vocab, reference_words(args.reference),
+                                              min_count=args.min_count, max_distance=args.max_distance)
+    print(f"Dictionary: {len(normalizer.words)} trusted words, {len(normalizer.index)} delete keys")
+
+    corrected_records = 0
+    corrections = Counter()
+    with open(args.output, "w", encoding="utf-8") as out:
+        for path in args.inputs:
+            for example in read_jsonl(path):
+                example, changes = correct_record(example, normalizer)
+                if changes:
+                    corrected_records += 1
+                    corrections.update(changes)
+                out.write(json.dumps(example, ensure_ascii=False) + "\n")
+    print(f"Corrected {corrected_records} records ({sum(corrections.values())} words) into {args.output}")
+    for (before, after), count in corrections.most_common(20):
+        print(f"  {before} -> {after} ({count})")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,150 @@
+#!/usr/bin/env python3
+"""
+Minimal asyncio client for OpenAI-compatible chat completion endpoints.
+Stdlib only, so the fine-tuning scripts run without extra installs.
+"""
+import asyncio
+import json
+import os
+import ssl
+from urllib.parse import urlsplit
+
+DEFAULT_ENDPOINT = os.environ.get("SEARCHO_LLM_ENDPOINT", "https://api.openai.com/v1/chat/completions")
+DEFAULT_MODEL = os.environ.get("SEARCHO_LLM_MODEL", "gpt-4.1-mini-2025-04-14")
+
+
+class HTTPError(Exception):
+    """Raised for non-2xx responses; carries the status and body."""
+
+    def __init__(self, status, body):
+        super().__init__(f"HTTP {status}: {body[:200]!r}")
+        self.status = status
+        self.body = body
+
+    @property
+    def retryable(self):
+        return self.status == 429 or self.status >= 500
+
+
+def auth_headers(api_key=None):
+    """Bearer auth headers, read from OPENAI_API_KEY when no key is given."""
+    api_key = api_key or os.environ.get("OPENAI_API_KEY")
+    return {"Authorization": f"Bearer {api_key}"} if api_key else {}
+
+
+def chat_completion_body(messages, model=DEFAULT_MODEL, response_format=None, stream=False, **params):
+    """Build a /chat/completions request body."""
+    body = {"model": model, "messages": messages}
+    if response_format is not None:
+        body["response_format"] = response_format
+    if stream:
+        body["stream"] = True
+    body.update(params)
+    return body
+
+
+def message_content(response):
+    """Return the assistant message text of a non-streamed completion."""
+    return response["choices"][0]["message"]["content"]
+
+
+async def open_request(url, payload, headers=None, method="POST"):
+    """Send a JSON request and read the response head.
+
+    Returns (status, headers, reader, writer); the caller owns the connection
+    and should drain the body with iter_body() before closing the writer.
+    """
+    parts = urlsplit(url)
+    secure = parts.scheme == "https"
+    port = parts.port or (443 if secure else 80)
+    reader, writer = await asyncio.open_connection(
+        parts.hostname, port, ssl=ssl.create_default_context() if secure else None
+    )
+    body = b"" if payload is None else json.dumps(payload, ensure_ascii=False).encode("utf-8")
+    target = parts.path or "/"
+    if parts.query:
+        target += "?" + parts.query
+    lines = [
+        f"{method} {target} HTTP/1.1",
+        f"Host: {parts.netloc}",
+        "Connection: close",
+        "Content-Type: application/json",
+        f"Content-Length: {len(body)}",
+    ]
+    lines.extend(f"{k}: {v}" for k, v in (headers or {}).items())
+    writer.write(("\r\n".join(lines) + "\r\n\r\n").encode("latin-1") + body)
+    await writer.drain()
+
+    status_line = await reader.readline()
+    if not status_line:
+        writer.close()
+        raise ConnectionError(f"empty response from {url}")
+    status = int(status_line.split()[1])
+    response_headers = {}
+    while True:
+        line = await reader.readline()
+        if line in (b"\r\n", b"\n", b""):
+            break
+        key, _, value = line.decode("latin-1").partition(":")
+        response_headers[key.strip().lower()] = value.strip()
+    return status, response_headers, reader, writer
+
+
+async def iter_body(reader, headers):
+    """Yield raw body chunks as they arrive (handles chunked transfer)."""
+    if headers.get("transfer-encoding", "").lower() == "chunked":
+        while True:
+            size = int((await reader.readline()).split(b";")[0].strip() or b"0", 16)
+            if size == 0:
+                await reader.readline()
+                return
+            yield await reader.readexactly(size)
+            await reader.readline()
+    elif "content-length" in headers:
+        remaining = int(headers["content-length"])
+        while remaining > 0:
+            chunk = await reader.read(min(remaining, 65536))
+            if not chunk:
+                return
+            remaining -= len(chunk)
+            yield chunk
+    else:
+        while True:
+            chunk = await reader.read(65536)
+            if not chunk:
+                return
+            yield chunk
+
+
+async def iter_chat_deltas(reader, headers):
+    """Yield assistant content deltas from a streamed (SSE) chat completion."""
+    pending = b""
+    async for chunk in iter_body(reader, headers):
+        *lines, pending = (pending + chunk).split(b"\n")
+        for line in lines:
+            line = line.strip()
+            if not line.startswith(b"data:"):
+                continue
+            data = line[5:].strip()
+            if data == b"[DONE]":
+                return
+            choices = json.loads(data).get("choices") or [{}]
+            content = choices[0].get("delta", {}).get("content")
+            if content:
+                yield content
+
+
+async def post_json(url, payload, headers=None, timeout=60.0):
+    """POST a JSON payload and return the decoded JSON response."""
+
+    async def run():
+        status, response_headers, reader, writer = await open_request(url, payload, headers)
+        try:
+            body = b"".join([chunk async for chunk in iter_body(reader, response_headers)])
+        finally:
+            writer.close()
+        if not 200 <= status < 300:
+            raise HTTPError(status, body.decode("utf-8", "replace"))
+        return json.loads(body)
+
+    return await asyncio.wait_for(run(), timeout)
@@ -0,0 +1,278 @@
+#!/usr/bin/env python3
+"""
+Retrieval-based plan cache: serve the curated plan of the nearest known
+request instead of generating a new one.
+
+Every complete example (the curated mobile banking examples from
+get_new_mobile_banking_examples(), plus any complete examples in the given
+JSONL files, e.g. Şimal's) is indexed by its request text. Requests are
+diacritic-folded, lowercased, split into words and reduced by a light Turkish
+suffix stemmer, then stored in a BM25 inverted index. A query only walks the
+postings of its own terms. Alongside the raw BM25 score each match carries a
+confidence in [0, 1]: the score divided by the query's score against itself,
+scaled down when the idf of the query terms the match shares is below
+--min-idf. Without that scaling a query made only of boilerplate
+("araştırmak istiyoruz") would look like a near-exact restatement of every
+request that contains it. Confidence is still relative to one index, so pick
+the serving threshold on held-out requests whenever the indexed data changes.
+
+The service answers POST /search {"message": ..., "k": 3} and GET /health on
+a local port, with an LRU cache keyed by the normalized query.
+
+Usage:
+    python plan_cache_service.py --inputs merged_training_data.jsonl --port 8090
+    curl -s localhost:8090/search -d '{"message": "Kredi kartı başvuru sürecini araştırmak istiyoruz"}'
+"""
+import argparse
+import json
+import math
+import re
+import threading
+import time
+from collections import OrderedDict
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from canonicalize_prompts import fold, request_text
+from generate_merged_training import get_new_mobile_banking_examples, get_plan, get_user_message, read_jsonl
+
+_WORD = re.compile(r"\w+", re.UNICODE)
+
+# Folded (ASCII) suffixes, longest first; stripped repeatedly while the stem stays >= MIN_STEM letters.
+SUFFIXES = sorted({
+    "lar", "ler", "lari", "leri", "larin", "lerin", "imiz", "umuz", "iniz", "unuz", "miz", "muz", "niz", "nuz",
+    "si", "su", "sini", "sunu", "sinin", "sunun", "sinda", "sunda", "sindan", "sundan", "ini", "unu", "inin", "unun",
+    "nin", "nun", "in", "un", "yi", "yu", "ya", "ye", "da", "de", "ta", "te", "dan", "den", "tan", "ten",
+    "nda", "nde", "ndan", "nden", "la", "le", "yla", "yle", "ki", "lik", "luk", "ci", "cu", "ca", "ce", "siz", "suz",
+    "mak", "mek", "ma", "me", "yor", "iyor", "uyor", "dir", "dur", "tir", "tur", "mis", "mus",
+}, key=len, reverse=True)
+MIN_STEM = 4
+STOPWORDS = {"ve", "ile", "bir", "bu", "icin", "da", "de", "mi", "ne", "nasil", "olan", "gibi", "daha", "cok"}
+
+
+def stem(word):
+    """Light suffix stripping on a folded word; keeps at least MIN_STEM letters."""
+    for _ in range(3):
+        for suffix in SUFFIXES:
+            if word.endswith(suffix) and len(word) - len(suffix) >= MIN_STEM:
+                word = word[:-len(suffix)]
+                break
+        else:
+            break
+    return word
+
+
+def analyze(text):
+    """Request text -> list of index terms."""
+    return [stem(w) for w in _WORD.findall(fold(request_text(text))) if w not in STOPWORDS and not w.isdigit()]
+
+
+class BM25Index:
+    """Inverted index from terms to (doc id, term frequency) postings."""
+
+    def __init__(self, k1=1.2, b=0.75, min_idf=3.0):
+        self.k1 = k1
+        self.b = b
+        self.min_idf = min_idf
+        self.postings = {}
+        self.doc_lengths = []
+        self.docs = []
+        self.keys = set()
+        self.idf = {}
+        self.average_length = 0.0
+
+    def add(self, request, plan, source):
+        key = " ".join(_WORD.findall(fold(request_text(request))))
+        terms = analyze(request)
+        if not terms or key in self.keys:
+            return False
+        self.keys.add(key)
+        doc_id = len(self.docs)
+        self.docs.append({"request": request_text(request), "researchPlan": plan.get("researchPlan"),
+                          "chatResponse": plan.get("chatResponse"), "source": source})
+        self.doc_lengths.append(len(terms))
+        counts = {}
+        for term in terms:
+            counts[term] = counts.get(term, 0) + 1
+        for term, tf in counts.items():
+            self.postings.setdefault(term, []).append((doc_id, tf))
+        return True
+
+    def finalize(self):
+        """Compute idf and the average length once all documents are added."""
+        n = len(self.docs)
+        self.average_length = sum(self.doc_lengths) / max(n, 1)
+        self.idf = {term: math.log(1 + (n - len(p) + 0.5) / (len(p) + 0.5)) for term, p in self.postings.items()}
+
+    def _bm25(self, tf, idf, length):
+        norm = self.k1 * (1 - self.b + self.b * length / self.average_length)
+        return idf * tf * (self.k1 + 1) / (tf + norm)
+
+    def search(self, text, k=3):
+        """Top-k documents as (score, confidence, doc id)."""
+        terms = analyze(text)
+        counts = {}
+        for term in terms:
+            counts[term] = counts.get(term, 0) + 1
+        scores = {}
+        matched_idf = {}
+        ceiling = 0.0
+        unseen_idf = math.log(1 + (len(self.docs) + 0.5) / 0.5)
+        for term, query_tf in counts.items():
+            idf = self.idf.get(term, unseen_idf)
+            ceiling += self._bm25(query_tf, idf, len(terms))
+            for doc_id, tf in self.postings.get(term, ()):
+                scores[doc_id] = scores.get(doc_id, 0.0) + self._bm25(tf, idf, self.doc_lengths[doc_id])
+                matched_idf[doc_id] = matched_idf.get(doc_id, 0.0) + idf
+        # The query scored as if it were a document (terms unknown to the index count
+        # as maximally rare), so an exact restatement lands near 1.0; matches sharing
+        # less than min_idf of informative terms are discounted in proportion.
+        ceiling = ceiling or 1.0
+        top = sorted(scores.items(), key=lambda item: -item[1])[:k]
+        return [(score, min(score / ceiling, 1.0) * min(matched_idf[doc_id] / self.min_idf, 1.0), doc_id)
+                for doc_id, score in top]
+
+
+def build_index(paths=(), include_curated=True, min_idf=3.0):
+    index = BM25Index(min_idf=min_idf)
+
+    def add_examples(examples, source):
+        for example in examples:
+            plan = get_plan(example)
+            if plan is not None:
+                index.add(get_user_message(example), plan, source)
+
+    if include_curated:
+        add_examples(get_new_mobile_banking_examples(), "new_banking")
+    for path in paths:
+        add_examples(read_jsonl(path), path)
+    index.finalize()
+    return index
+
+
+class LRUCache:
+    """Thread-safe least-recently-used cache with hit/miss counters."""
+
+    def __init__(self, capacity=1024):
+        self.capacity = capacity
+        self.items = OrderedDict()
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key):
+        with self.lock:
+            if key in self.items:
+                self.items.move_to_end(key)
+                self.hits += 1
+                return self.items[key]
+            self.misses += 1
+            return None
+
+    def put(self, key, value):
+        with self.lock:
+            self.items[key] = value
+            self.items.move_to_end(key)
+            if len(self.items) > self.capacity:
+                self.items.popitem(last=False)
+
+
+class PlanCache:
+    """BM25 index plus an LRU cache of recent query results."""
+
+    def __init__(self, index, cache_size=1024):
+        self.index = index
+        self.cache = LRUCache(cache_size)
+
+    def lookup(self, message, k=3):
+        key = (" ".join(analyze(message)), k)
+        matches = self.cache.get(key)
+        cached = matches is not None
+        if not cached:
+            matches = [dict(self.index.docs[doc_id], score=round(score, 4), confidence=round(confidence, 4))
+                       for score, confidence, doc_id in self.index.search(message, k)]
+            self.cache.put(key, matches)
+        return matches, cached
+
+
+class CacheHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, format, *args):
+        if self.server.verbose:
+            super().log_message(format, *args)
+
+    def _send_json(self, status, payload):
+        body = json.dumps(payload, ensure_ascii=False).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        if self.path != "/health":
+            self._send_json(404, {"error": "not found"})
+            return
+        cache = self.server.plan_cache.cache
+        self._send_json(200, {"documents": len(self.server.plan_cache.index.docs), "cached_queries": len(cache.items),
+                              "hits": cache.hits, "misses": cache.misses})
+
+    def do_POST(self):
+        if self.path != "/search":
+            self._send_json(404, {"error": "not found"})
+            return
+        started = time.perf_counter()
+        try:
+            request = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))) or b"{}")
+            message = request["message"]
+            k = request.get("k", 3)
+        except (ValueError, KeyError, TypeError):
+            message = k = None
+        if not isinstance(message, str) or not isinstance(k, int) or isinstance(k, bool) or k < 1:
+            self._send_json(400, {"error": "expected {\"message\": str, \"k\": positive int}"})
+            return
+        matches, cached = self.server.plan_cache.lookup(message, k)
+        self._send_json(200, {"matches": matches, "cached": cached,
+                              "took_ms": round((time.perf_counter() - started) * 1000, 3)})
+
+
+def make_server(plan_cache, host="127.0.0.1", port=8090, verbose=False):
+    server = ThreadingHTTPServer((host, port), CacheHandler)
+    server.daemon_threads = True
+    server.plan_cache = plan_cache
+    server.verbose = verbose
+    return server
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Serve curated plans for requests similar to known ones.")
+    parser.add_argument("--inputs", nargs="*", default=[], help="JSONL files with complete examples to index")
+    parser.add_argument("--no-curated", action="store_true", help="skip get_new_mobile_banking_examples()")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8090)
+    parser.add_argument("--min-idf", type=float, default=3.0,
+                        help="shared idf a match needs for full confidence (about one rare term)")
+    parser.add_argument("--cache-size", type=int, default=1024, help="recent queries kept in the LRU cache")
+    parser.add_argument("--query", default=None, help="print matches for one request and exit")
+    args = parser.parse_args()
+
+    started = time.perf_counter()
+    index = build_index(args.inputs, include_curated=not args.no_curated, min_idf=args.min_idf)
+    print(f"Indexed {len(index.docs)} plans ({len(index.postings)} terms) in {time.perf_counter() - started:.2f}s")
+    plan_cache = PlanCache(index, args.cache_size)
+    if args.query:
+        matches, _ = plan_cache.lookup(args.query)
+        for match in matches:
+            print(f"  {match['confidence']:.2f} ({match['score']:.2f}) {match['request']}")
+        return
+
+    server = make_server(plan_cache, args.host, args.port, verbose=True)
+    print(f"Plan cache: http://{args.host}:{args.port}/search")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
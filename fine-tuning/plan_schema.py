@@ -0,0 +1,67 @@
+#!/usr/bin/env python3
+"""
+Validate research plans against the strict schema in response_format.json.
+Covers the JSON Schema subset the planner format uses (object, array, string,
+properties, required, additionalProperties, items).
+"""
+import json
+import os
+
+RESPONSE_FORMAT_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "response_format.json")
+
+_TYPE_CHECKS = {
+    "object": lambda v: isinstance(v, dict),
+    "array": lambda v: isinstance(v, list),
+    "string": lambda v: isinstance(v, str),
+    "number": lambda v: isinstance(v, (int, float)) and not isinstance(v, bool),
+    "integer": lambda v: isinstance(v, int) and not isinstance(v, bool),
+    "boolean": lambda v: isinstance(v, bool),
+}
+
+
+def load_response_format(path=RESPONSE_FORMAT_PATH):
+    """Load the response_format payload sent with planner requests."""
+    with open(path, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def load_plan_schema(path=RESPONSE_FORMAT_PATH):
+    """Return the bare JSON schema of a research plan."""
+    return load_response_format(path)["json_schema"]["schema"]
+
+
+def schema_errors(value, schema, path="$"):
+    """Return a list of human-readable schema violations for value."""
+    errors = []
+    expected = schema.get("type")
+    if expected and not _TYPE_CHECKS[expected](value):
+        return [f"{path}: expected {expected}, got {type(value).__name__}"]
+
+    if expected == "object":
+        properties = schema.get("properties", {})
+        for key in schema.get("required", []):
+            if key not in value:
+                errors.append(f"{path}: missing required field '{key}'")
+        for key, item in value.items():
+            if key in properties:
+                errors.extend(schema_errors(item, properties[key], f"{path}.{key}"))
+            elif schema.get("additionalProperties") is False:
+                errors.append(f"{path}: unexpected field '{key}'")
+    elif expected == "array" and "items" in schema:
+        for i, item in enumerate(value):
+            errors.extend(schema_errors(item, schema["items"], f"{path}[{i}]"))
+    return errors
+
+
+def validate_plan(plan, schema=None):
+    """Validate a decoded plan; returns a list of errors (empty when valid)."""
+    return schema_errors(plan, schema or load_plan_schema())
+
+
+def parse_plan(text, schema=None):
+    """Decode and validate a plan string; returns (plan, errors)."""
+    try:
+        plan = json.loads(text)
+    except (TypeError, ValueError) as e:
+        return None, [f"$: invalid JSON ({e})"]
+    return plan, validate_plan(plan, schema)
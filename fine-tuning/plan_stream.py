@@ -0,0 +1,330 @@
+#!/usr/bin/env python3
+"""
+Incremental, schema-aware JSON parser for streamed plan outputs.
+
+Feed the model's output as it arrives; the parser keeps a stack of open
+objects and arrays, each paired with its sub-schema from response_format.json,
+and raises PlanStreamError as soon as the output can no longer be valid:
+a value of the wrong type, a field the schema does not allow, a duplicate
+field, an object closed without its required fields, or an array or string
+over a configured limit. Callers can then drop the connection instead of
+paying for the rest of the generation. close() returns the decoded value
+once the whole document has arrived.
+
+Usage:
+    python plan_stream.py completed.jsonl --max-sections 8 --max-questions 6
+"""
+import argparse
+import json
+import re
+
+from plan_schema import load_plan_schema
+
+SECTIONS_PATH = "$.researchPlan.sections"
+QUESTIONS_PATH = "$.researchPlan.sections[].questions"
+
+_WHITESPACE = " \t\r\n"
+_STRING_RUN = re.compile(r'[^"\\]*')
+_SCALAR_RUN = re.compile(r"[-+0-9.eEtrufalsn]*")
+_SCALAR_KIND = {"t": "boolean", "f": "boolean", "n": "null"}
+
+
+class PlanStreamError(ValueError):
+    """The streamed output can no longer become a valid plan."""
+
+    def __init__(self, message, path, offset):
+        super().__init__(f"{path}: {message} (at char {offset})")
+        self.path = path
+        self.offset = offset
+
+
+def plan_limits(max_sections=None, max_questions=None):
+    """max_items mapping for the usual plan limits."""
+    limits = {}
+    if max_sections:
+        limits[SECTIONS_PATH] = max_sections
+    if max_questions:
+        limits[QUESTIONS_PATH] = max_questions
+    return limits
+
+
+def _type_matches(expected, kind):
+    return expected is None or expected == kind or (expected == "integer" and kind == "number")
+
+
+class _Frame:
+    __slots__ = ("kind", "schema", "path", "pattern", "value", "state", "key", "count")
+
+    def __init__(self, kind, schema, path, pattern):
+        self.kind = kind
+        self.schema = schema
+        self.path = path
+        self.pattern = pattern
+        self.value = {} if kind == "object" else []
+        self.state = "first"
+        self.key = None
+        self.count = 0
+
+
+class PlanStreamParser:
+    """Push parser: call feed() with each chunk of text, then close()."""
+
+    def __init__(self, schema=None, max_items=None, max_string_length=None):
+        self.schema = schema if schema is not None else load_plan_schema()
+        self.max_items = max_items or {}
+        self.max_string_length = max_string_length
+        self.consumed = 0
+        self.stack = []
+        self.buffer = ""
+        self.string = None
+        self.string_path = None
+        self.scalar = None
+        self.string_length = 0
+        self.string_is_key = False
+        self.done = False
+        self.result = None
+
+    def _fail(self, message, path=None, offset=None):
+        if path is None:
+            path = self.stack[-1].path if self.stack else "$"
+        raise PlanStreamError(message, path, self.consumed if offset is None else offset)
+
+    # -- schema bookkeeping --------------------------------------------------
+
+    def _child(self):
+        """(schema, path, pattern) of the value about to start."""
+        if not self.stack:
+            return self.schema, "$", "$"
+        frame = self.stack[-1]
+        if frame.kind == "object":
+            schema = frame.schema.get("properties", {}).get(frame.key, {})
+            return schema, f"{frame.path}.{frame.key}", f"{frame.pattern}.{frame.key}"
+        frame.count += 1
+        limit = self.max_items.get(frame.pattern)
+        if limit is not None and frame.count > limit:
+            self._fail(f"more than {limit} items")
+        return frame.schema.get("items", {}), f"{frame.path}[{frame.count - 1}]", f"{frame.pattern}[]"
+
+    def _begin_value(self, kind):
+        """Check that a value of this kind may start here; returns its (schema, path, pattern)."""
+        if self.done:
+            self._fail("unexpected data after the document", "$")
+        if self.stack:
+            frame = self.stack[-1]
+            if frame.kind == "object" and frame.state in ("first", "key"):
+                self._fail("expected a field name")
+            if frame.state not in ("first", "value"):
+                self._fail("expected ',' or a closing bracket")
+        schema, path, pattern = self._child()
+        expected = schema.get("type")
+        if not _type_matches(expected, kind):
+            self._fail(f"expected {expected}, got {kind}", path)
+        return schema, path, pattern
+
+    def _end_value(self, value):
+        if not self.stack:
+            self.result = value
+            self.done = True
+            return
+        frame = self.stack[-1]
+        if frame.kind == "object":
+            frame.value[frame.key] = value
+        else:
+            frame.value.append(value)
+        frame.state = "separator"
+
+    def _begin_key(self):
+        frame = self.stack[-1] if self.stack else None
+        if frame is None or frame.kind != "object" or frame.state not in ("first", "key"):
+            return False
+        self.string_is_key = True
+        return True
+
+    def _end_key(self, key):
+        frame = self.stack[-1]
+        if key in frame.value:
+            self._fail(f"duplicate field '{key}'")
+        properties = frame.schema.get("properties", {})
+        if key not in properties and frame.schema.get("additionalProperties") is False:
+            self._fail(f"unexpected field '{key}'")
+        frame.key = key
+        frame.state = "colon"
+
+    def _close_container(self, char):
+        if not self.stack:
+            self._fail(f"unexpected '{char}'")
+        frame = self.stack[-1]
+        if (frame.kind == "object") != (char == "}"):
+            self._fail(f"unexpected '{char}'")
+        if frame.state not in ("first", "separator"):
+            self._fail(f"unexpected '{char}'")
+        if frame.kind == "object":
+            missing = [k for k in frame.schema.get("required", []) if k not in frame.value]
+            if missing:
+                self._fail(f"missing required field '{missing[0]}'")
+        self.stack.pop()
+        self._end_value(frame.value)
+
+    # -- scanning -------------------------------------------------------------
+
+    def _scan_string(self, text, i):
+        """Consume string content from i; returns the index after it."""
+        n = len(text)
+        while i < n:
+            end = _STRING_RUN.match(text, i).end()
+            if end > i:
+                self.string.append(text[i:end])
+                self.string_length += end - i
+                self.consumed += end - i
+                i = end
+            if self.max_string_length and self.string_length > self.max_string_length:
+                self._fail(f"string longer than {self.max_string_length} characters", self.string_path)
+            if i >= n:
+                return n
+            if text[i] == '"':
+                raw = "".join(self.string)
+                self.string = None
+                self.consumed += 1
+                try:
+                    value = json.loads(f'"{raw}"')
+                except ValueError:
+                    self._fail("invalid string", self.string_path)
+                if self.string_is_key:
+                    self.string_is_key = False
+                    self._end_key(value)
+                else:
+                    self._end_value(value)
+                return i + 1
+            width = 6 if text[i + 1:i + 2] == "u" else 2
+            if i + width > n:
+                self.buffer = text[i:]
+                return n
+            self.string.append(text[i:i + width])
+            self.string_length += 1
+            self.consumed += width
+            i += width
+        return n
+
+    def feed(self, text):
+        """Consume the next chunk of model output."""
+        text = self.buffer + text
+        self.buffer = ""
+        i, n = 0, len(text)
+        if self.scalar is not None:
+            i = self._scan_scalar(text, 0, *self.scalar)
+        while i < n:
+            if self.string is not None:
+                i = self._scan_string(text, i)
+                continue
+
+            char = text[i]
+            if char in _WHITESPACE:
+                i += 1
+                self.consumed += 1
+                continue
+            if char == '"':
+                if self._begin_key():
+                    self.string_path = self.stack[-1].path
+                else:
+                    self.string_path = self._begin_value("string")[1]
+                self.string = []
+                self.string_length = 0
+                i += 1
+                self.consumed += 1
+                continue
+            if char in "{[":
+                kind = "object" if char == "{" else "array"
+                schema, path, pattern = self._begin_value(kind)
+                self.stack.append(_Frame(kind, schema, path, pattern))
+            elif char in "}]":
+                self._close_container(char)
+            elif char == ":":
+                if not self.stack or self.stack[-1].state != "colon":
+                    self._fail("unexpected ':'")
+                self.stack[-1].state = "value"
+            elif char == ",":
+                if not self.stack or self.stack[-1].state != "separator":
+                    self._fail("unexpected ','")
+                self.stack[-1].state = "key" if self.stack[-1].kind == "object" else "value"
+            else:
+                end = _SCALAR_RUN.match(text, i).end()
+                if end == i:
+                    self._fail(f"unexpected character {char!r}")
+                schema, path, _ = self._begin_value(_SCALAR_KIND.get(char, "number"))
+                i = self._scan_scalar(text, i, schema, path)
+                continue
+            i += 1
+            self.consumed += 1
+
+    def _scan_scalar(self, text, i, schema, path):
+        """Consume a number or literal from i; one cut off at the end of the chunk is buffered."""
+        end = _SCALAR_RUN.match(text, i).end()
+        if end == len(text):
+            self.buffer = text[i:]
+            self.scalar = (schema, path)
+            return end
+        self.scalar = None
+        self._scalar(text[i:end], schema, path)
+        return end
+
+    def _scalar(self, token, schema, path):
+        try:
+            value = json.loads(token)
+        except ValueError:
+            self._fail(f"invalid literal {token!r}", path)
+        if schema.get("type") == "integer" and not isinstance(value, int):
+            self._fail("expected integer", path)
+        self.consumed += len(token)
+        self._end_value(value)
+
+    def close(self):
+        """Finish the stream; returns the decoded document."""
+        if self.scalar is not None:
+            self._scalar(self.buffer, *self.scalar)
+            self.buffer, self.scalar = "", None
+        if not self.done:
+            self._fail("output ended before the document was complete")
+        return self.result
+
+
+def parse_stream(chunks, schema=None, **limits):
+    """Parse an iterable of text chunks; returns (plan, errors) like parse_plan()."""
+    parser = PlanStreamParser(schema, **limits)
+    try:
+        for chunk in chunks:
+            parser.feed(chunk)
+        return parser.close(), []
+    except PlanStreamError as e:
+        return None, [str(e)]
+
+
+def main():
+    from generate_merged_training import get_plan, read_jsonl
+
+    parser = argparse.ArgumentParser(description="Replay plans through the streaming parser in small chunks.")
+    parser.add_argument("inputs", nargs="+", help="JSONL files with completed examples")
+    parser.add_argument("--chunk-chars", type=int, default=16, help="characters per simulated delta")
+    parser.add_argument("--max-sections", type=int, default=None)
+    parser.add_argument("--max-questions", type=int, default=None)
+    args = parser.parse_args()
+
+    schema = load_plan_schema()
+    limits = plan_limits(args.max_sections, args.max_questions)
+    checked = failed = 0
+    for path in args.inputs:
+        for example in read_jsonl(path):
+            plan = get_plan(example)
+            if plan is None:
+                continue
+            text = json.dumps(plan, ensure_ascii=False)
+            chunks = (text[i:i + args.chunk_chars] for i in range(0, len(text), args.chunk_chars))
+            _, errors = parse_stream(chunks, schema, max_items=limits)
+            checked += 1
+            if errors:
+                failed += 1
+                print(f"  {errors[0]} of {len(text)} chars")
+    print(f"Checked {checked} plans: {failed} rejected")
+
+
+if __name__ == "__main__":
+    main()
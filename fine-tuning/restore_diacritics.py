@@ -0,0 +1,236 @@
+#!/usr/bin/env python3
+"""
+Restore Turkish characters in ASCII-folded text ("iade sureci cok uzun" ->
+"iade süreci çok uzun") with one Aho-Corasick pass per string.
+
+The lexicon is read from supabase/functions/_shared/turkish-text.ts
+(WORD_REPLACEMENTS and SPECIAL_REPLACEMENTS), so the app and the training
+pipeline restore the same words. Matches are leftmost-longest and must sit
+on word boundaries; unlike the JS \\b, a boundary here treats Turkish letters
+as word characters, so fragments of already-correct words are never touched.
+
+Usage:
+    python restore_diacritics.py eval_data_rft.jsonl -o eval_restored.jsonl --workers 4
+    python restore_diacritics.py eval_data_rft.jsonl --benchmark
+"""
+import argparse
+import json
+import os
+import re
+import time
+from collections import deque
+
+from parallel_jsonl import read_jsonl_parallel
+
+LEXICON_PATH = os.path.join(
+    os.path.dirname(os.path.abspath(__file__)), "..", "supabase", "functions", "_shared", "turkish-text.ts"
+)
+_WORD_ENTRY = re.compile(r'^\s*"?([a-z ]+)"?:\s*"([^"]+)",?\s*$')
+_SPECIAL_ENTRY = re.compile(r'^\s*\[/\\b(.+?)\\b/gi,\s*"([^"]+)"\],?\s*$')
+
+
+def load_lexicon(path=LEXICON_PATH):
+    """Parse {folded: restored} pairs out of turkish-text.ts."""
+    lexicon = {}
+    section = None
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            if line.startswith("const WORD_REPLACEMENTS"):
+                section = _WORD_ENTRY
+            elif line.startswith("const SPECIAL_REPLACEMENTS"):
+                section = _SPECIAL_ENTRY
+            elif line.startswith(("};", "];")):
+                section = None
+            elif section is not None:
+                match = section.match(line)
+                if match:
+                    lexicon[match.group(1)] = match.group(2)
+    return lexicon
+
+
+def tr_upper(text):
+    return text.replace("i", "İ").upper()
+
+
+def match_case(source, replacement):
+    """Carry the casing of the matched text over to its replacement."""
+    if source == source.upper() and source != source.lower():
+        return tr_upper(replacement)
+    if source[:1].isupper() and source[1:] == source[1:].lower():
+        return tr_upper(replacement[:1]) + replacement[1:]
+    return replacement
+
+
+def _is_word_char(ch):
+    return ch.isalnum() or ch == "_"
+
+
+def _lower_same_length(text):
+    lowered = text.replace("İ", "i").lower()
+    if len(lowered) == len(text):
+        return lowered
+    return "".join(c if len(c.lower()) != 1 else c.lower() for c in text)
+
+
+class DiacriticRestorer:
+    """Aho-Corasick automaton over the lowercase folded lexicon keys."""
+
+    def __init__(self, lexicon):
+        self.lexicon = lexicon
+        self.goto = [{}]
+        self.fail = [0]
+        self.output = [None]  # key ending at this state, if any
+        self.dict_link = [0]  # nearest proper suffix state with an output
+        for key in lexicon:
+            state = 0
+            for ch in key:
+                nxt = self.goto[state].get(ch)
+                if nxt is None:
+                    nxt = len(self.goto)
+                    self.goto[state][ch] = nxt
+                    self.goto.append({})
+                    self.fail.append(0)
+                    self.output.append(None)
+                    self.dict_link.append(0)
+                state = nxt
+            self.output[state] = key
+
+        queue = deque(self.goto[0].values())
+        while queue:
+            state = queue.popleft()
+            for ch, nxt in self.goto[state].items():
+                queue.append(nxt)
+                f = self.fail[state]
+                while f and ch not in self.goto[f]:
+                    f = self.fail[f]
+                target = self.goto[f].get(ch, 0)
+                self.fail[nxt] = target if target != nxt else 0
+                link = self.fail[nxt]
+                self.dict_link[nxt] = link if self.output[link] else self.dict_link[link]
+
+    def find(self, text):
+        """Leftmost-longest, non-overlapping, word-bounded matches as (start, end, key)."""
+        lowered = _lower_same_length(text)
+        n = len(text)
+        candidates = []
+        state = 0
+        for i, ch in enumerate(lowered):
+            while state and ch not in self.goto[state]:
+                state = self.fail[state]
+            state = self.goto[state].get(ch, 0)
+            hit = state if self.output[state] else self.dict_link[state]
+            if not hit:
+                continue
+            end = i + 1
+            if end < n and _is_word_char(text[end]):
+                continue
+            while hit:
+                key = self.output[hit]
+                start = end - len(key)
+                if start == 0 or not _is_word_char(text[start - 1]):
+                    candidates.append((start, end, key))
+                hit = self.dict_link[hit]
+
+        candidates.sort(key=lambda m: (m[0], -m[1]))
+        matches, last_end = [], 0
+        for start, end, key in candidates:
+            if start >= last_end:
+                matches.append((start, end, key))
+                last_end = end
+        return matches
+
+    def restore(self, text):
+        if not isinstance(text, str) or not text.strip():
+            return text
+        parts, position = [], 0
+        for start, end, key in self.find(text):
+            parts.append(text[position:start])
+            parts.append(match_case(text[start:end], self.lexicon[key]))
+            position = end
+        parts.append(text[position:])
+        return "".join(parts)
+
+
+class RegexRestorer:
+    """Port of restoreTurkishCharacters(): chained regex passes, for benchmarking."""
+
+    def __init__(self, lexicon):
+        self.lexicon = lexicon
+        phrases = sorted(lexicon, key=len, reverse=True)
+        self.specials = [(re.compile(rf"\b{re.escape(k)}\b", re.IGNORECASE), v) for k, v in lexicon.items() if " " in k]
+        self.words = re.compile(r"\b(" + "|".join(map(re.escape, phrases)) + r")\b", re.IGNORECASE)
+
+    def restore(self, text):
+        if not isinstance(text, str) or not text.strip():
+            return text
+        for pattern, replacement in self.specials:
+            text = pattern.sub(lambda m: match_case(m.group(0), replacement), text)
+        return self.words.sub(lambda m: match_case(m.group(0), self.lexicon.get(m.group(0).lower(), m.group(0))), text)
+
+
+_restorer = None
+
+
+def default_restorer():
+    """Process-wide restorer, built lazily (once per pool worker)."""
+    global _restorer
+    if _restorer is None:
+        _restorer = DiacriticRestorer(load_lexicon())
+    return _restorer
+
+
+def restore_record(example):
+    """Restore user turns of a chat example; top-level so pool workers can pickle it."""
+    restorer = default_restorer()
+    messages = [
+        dict(msg, content=restorer.restore(msg["content"])) if msg["role"] == "user" else msg
+        for msg in example["messages"]
+    ]
+    return dict(example, messages=messages)
+
+
+def restore_record_flagged(example):
+    """restore_record() plus whether anything changed, for reporting."""
+    restored = restore_record(example)
+    return restored != example, restored
+
+
+def benchmark(path, repeat):
+    lexicon = load_lexicon()
+    texts = [msg["content"] for e in read_jsonl_parallel(path, workers=1) for msg in e["messages"]] * repeat
+    for name, restorer in (("aho-corasick", DiacriticRestorer(lexicon)), ("regex", RegexRestorer(lexicon))):
+        started = time.perf_counter()
+        for text in texts:
+            restorer.restore(text)
+        elapsed = time.perf_counter() - started
+        chars = sum(map(len, texts))
+        print(f"  {name}: {len(texts)} strings in {elapsed:.3f}s ({chars / elapsed / 1e6:.2f} M chars/s)")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Restore Turkish characters in JSONL user turns.")
+    parser.add_argument("input")
+    parser.add_argument("-o", "--output")
+    parser.add_argument("--workers", type=int, default=None)
+    parser.add_argument("--benchmark", action="store_true", help="compare against the regex approach")
+    parser.add_argument("--repeat", type=int, default=50, help="benchmark repetitions of the input")
+    args = parser.parse_args()
+
+    if args.benchmark:
+        print(f"Lexicon: {len(load_lexicon())} entries")
+        benchmark(args.input, args.repeat)
+        return
+    if not args.output:
+        parser.error("give -o/--output or --benchmark")
+
+    changed = total = 0
+    with open(args.output, "w", encoding="utf-8") as out:
+        for was_changed, restored in read_jsonl_parallel(args.input, args.workers, transform=restore_record_flagged):
+            total += 1
+            changed += was_changed
+            out.write(json.dumps(restored, ensure_ascii=False) + "\n")
+    print(f"Restored {changed} of {total} records into {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,272 @@
+#!/usr/bin/env python3
+"""
+Fill prompt-only training examples with assistant plans from an
+OpenAI-compatible endpoint. Requests run concurrently under asyncio with
+bounded queues on both sides, so a slow writer throttles the workers instead
+of buffering results in memory. Progress is journaled next to the output and
+an interrupted run picks up where it stopped; requests that ended invalid,
+aborted or failed are tried again by the next run. With --stream, plans are
+checked while they stream in and the connection is dropped as soon as the
+output can no longer match the schema.
+
+Usage:
+    python rollout_completions.py rft_training_data_final.jsonl -o completed.jsonl --concurrency 32
+"""
+import argparse
+import asyncio
+import hashlib
+import json
+import os
+import random
+import time
+
+from canonicalize_prompts import request_text
+from generate_merged_training import get_user_message, make_complete, make_prompt_only, read_jsonl
+from openai_compat import (
+    DEFAULT_ENDPOINT, DEFAULT_MODEL, HTTPError, auth_headers, chat_completion_body, iter_body, iter_chat_deltas,
+    message_content, open_request, post_json,
+)
+from plan_schema import load_plan_schema, load_response_format, parse_plan
+from plan_stream import PlanStreamError, PlanStreamParser, plan_limits
+
+# Only successes are final; invalid, aborted and failed requests are retried by the next run.
+DONE_STATUSES = ("ok",)
+
+
+def request_key(request):
+    """Stable key for a request, using the same normalization as main()'s dedup."""
+    return hashlib.sha1(request.strip().lower().encode("utf-8")).hexdigest()
+
+
+def is_prompt_only(example):
+    return not any(msg["role"] == "assistant" for msg in example["messages"])
+
+
+def journal_path(output_path):
+    return output_path + ".progress"
+
+
+def load_done_keys(output_path):
+    """Keys already finished by an earlier run (journal plus written output)."""
+    done = set()
+    if os.path.exists(journal_path(output_path)):
+        with open(journal_path(output_path), "r", encoding="utf-8") as f:
+            for line in f:
+                try:
+                    entry = json.loads(line)
+                except ValueError:
+                    continue  # torn last line from a crash
+                if entry["status"] in DONE_STATUSES:
+                    done.add(entry["key"])
+    # A crash between the output write and the journal write must not duplicate records.
+    if os.path.exists(output_path):
+        with open(output_path, "r", encoding="utf-8") as f:
+            for line in f:
+                try:
+                    done.add(request_key(get_user_message(json.loads(line))))
+                except ValueError:
+                    continue
+    return done
+
+
+async def produce(input_paths, done, queue, concurrency, limit):
+    """Feed unfinished prompt-only requests into the work queue.
+
+    The workers' sentinels are sent even when reading the inputs fails, so
+    the pipeline drains and rollout() can re-raise the error. A cancelled
+    producer sends none: its workers are gone and the queue may be full.
+    """
+    seen = set(done)
+    queued = 0
+    cancelled = False
+    try:
+        for path in input_paths:
+            for example in read_jsonl(path):
+                if not is_prompt_only(example):
+                    continue
+                request = request_text(get_user_message(example))
+                key = request_key(request)
+                if not request or key in seen:
+                    continue
+                seen.add(key)
+                await queue.put((key, request))
+                queued += 1
+                if limit and queued >= limit:
+                    break
+            if limit and queued >= limit:
+                break
+    except asyncio.CancelledError:
+        cancelled = True
+        raise
+    finally:
+        if not cancelled:
+            for _ in range(concurrency):
+                await queue.put(None)
+    return queued
+
+
+async def stream_plan(endpoint, body, headers, schema, limits):
+    """Stream a completion through the incremental parser; raises PlanStreamError early."""
+    status, response_headers, reader, writer = await open_request(endpoint, body, headers)
+    try:
+        if not 200 <= status < 300:
+            error_body = b"".join([chunk async for chunk in iter_body(reader, response_headers)])
+            raise HTTPError(status, error_body.decode("utf-8", "replace"))
+        parser = PlanStreamParser(schema, max_items=limits)
+        async for delta in iter_chat_deltas(reader, response_headers):
+            parser.feed(delta)
+        return parser.close()
+    finally:
+        writer.close()
+
+
+async def complete_one(request, args, response_format, schema, headers):
+    """Request a plan, retrying transient failures; returns (status, record, detail)."""
+    body = chat_completion_body(
+        make_prompt_only(request)["messages"], args.model, response_format, stream=args.stream,
+        temperature=args.temperature,
+    )
+    limits = plan_limits(args.max_sections, args.max_questions)
+    status, detail = "error", ""
+    for attempt in range(args.max_retries + 1):
+        if attempt:
+            await asyncio.sleep(min(args.backoff * 2 ** (attempt - 1), 30.0) * (0.5 + random.random()))
+        try:
+            if args.stream:
+                plan = await asyncio.wait_for(stream_plan(args.endpoint, body, headers, schema, limits), args.timeout)
+                errors = []
+            else:
+                response = await post_json(args.endpoint, body, headers, timeout=args.timeout)
+                plan, errors = parse_plan(message_content(response), schema)
+        except PlanStreamError as e:
+            status, detail = "invalid", f"aborted: {e}"
+            continue
+        except HTTPError as e:
+            status, detail = "error", str(e)
+            if not e.retryable:
+                return "error", None, detail
+            continue
+        except (OSError, asyncio.TimeoutError, asyncio.IncompleteReadError, ValueError) as e:
+            status, detail = "error", f"{type(e).__name__}: {e}"
+            continue
+        except (KeyError, IndexError, TypeError) as e:
+            # A 2xx body without choices, e.g. {"error": ...}.
+            status, detail = "error", f"malformed response: {type(e).__name__}: {e}"
+            continue
+
+        if errors:
+            status, detail = "invalid", "; ".join(errors[:3])
+            continue
+        record = make_complete(
+            request, plan["chatResponse"], plan["researchPlan"]["title"], plan["researchPlan"]["sections"]
+        )
+        return "ok", record, ""
+    return status, None, detail
+
+
+async def work(queue, results, args, response_format, schema, headers):
+    """Complete queued requests until the sentinel, then send the writer this worker's sentinel.
+
+    Failures of a single request are written as errors; the sentinel is sent
+    on every exit except cancellation, when the writer may be gone.
+    """
+    cancelled = False
+    try:
+        while True:
+            item = await queue.get()
+            if item is None:
+                return
+            key, request = item
+            try:
+                status, record, detail = await complete_one(request, args, response_format, schema, headers)
+            except Exception as e:
+                status, record, detail = "error", None, f"{type(e).__name__}: {e}"
+            await results.put((key, status, record, detail))
+    except asyncio.CancelledError:
+        cancelled = True
+        raise
+    finally:
+        if not cancelled:
+            await results.put(None)
+
+
+async def write_results(results, output_path, workers, stats):
+    """Single writer: appends records, then journals them, in that order."""
+    finished = 0
+    started = time.monotonic()
+    with open(output_path, "a", encoding="utf-8") as out, open(journal_path(output_path), "a", encoding="utf-8") as journal:
+        while finished < workers:
+            item = await results.get()
+            if item is None:
+                finished += 1
+                continue
+            key, status, record, detail = item
+            if record is not None:
+                out.write(json.dumps(record, ensure_ascii=False) + "\n")
+                out.flush()
+            journal.write(json.dumps({"key": key, "status": status, "detail": detail}, ensure_ascii=False) + "\n")
+            journal.flush()
+            stats[status] = stats.get(status, 0) + 1
+            total = sum(stats.values())
+            if total % 100 == 0:
+                os.fsync(out.fileno())
+                os.fsync(journal.fileno())
+                rate = total / max(time.monotonic() - started, 1e-9)
+                print(f"  {total} done ({rate:.1f}/s) {stats}")
+
+
+async def rollout(args):
+    response_format = load_response_format()
+    schema = load_plan_schema()
+    headers = auth_headers(args.api_key)
+    done = load_done_keys(args.output)
+    if done:
+        print(f"Resuming: {len(done)} requests already finished")
+
+    queue = asyncio.Queue(maxsize=args.concurrency * 2)
+    results = asyncio.Queue(maxsize=args.queue_size)
+    stats = {}
+    producer = asyncio.create_task(produce(args.inputs, done, queue, args.concurrency, args.limit))
+    workers = [
+        asyncio.create_task(work(queue, results, args, response_format, schema, headers))
+        for _ in range(args.concurrency)
+    ]
+    try:
+        await write_results(results, args.output, args.concurrency, stats)
+        await asyncio.gather(*workers)
+    except BaseException:
+        # Nothing drains the queues any more, so tasks blocked on them would never return.
+        for task in workers + [producer]:
+            task.cancel()
+        raise
+    queued = await producer  # re-raises an input error once finished work is written
+    return queued, stats
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Generate assistant plans for prompt-only examples.")
+    parser.add_argument("inputs", nargs="+", help="JSONL files with prompt-only examples")
+    parser.add_argument("-o", "--output", required=True, help="JSONL file to append completed examples to")
+    parser.add_argument("--endpoint", default=DEFAULT_ENDPOINT)
+    parser.add_argument("--model", default=DEFAULT_MODEL)
+    parser.add_argument("--api-key", default=None, help="defaults to $OPENAI_API_KEY")
+    parser.add_argument("--concurrency", type=int, default=16, help="requests in flight")
+    parser.add_argument("--queue-size", type=int, default=64, help="finished results buffered ahead of the writer")
+    parser.add_argument("--max-retries", type=int, default=4)
+    parser.add_argument("--backoff", type=float, default=1.0, help="base retry delay in seconds")
+    parser.add_argument("--timeout", type=float, default=120.0)
+    parser.add_argument("--temperature", type=float, default=0.7)
+    parser.add_argument("--limit", type=int, default=0, help="stop after this many new requests")
+    parser.add_argument("--stream", action="store_true", help="validate while streaming and abort invalid plans early")
+    parser.add_argument("--max-sections", type=int, default=None, help="with --stream, abort plans with more sections")
+    parser.add_argument("--max-questions", type=int, default=None, help="with --stream, abort sections with more questions")
+    args = parser.parse_args()
+
+    queued, stats = asyncio.run(rollout(args))
+    print(f"\nProcessed {queued} requests into {args.output}")
+    for status in ("ok", "invalid", "error"):
+        print(f"  - {status}: {stats.get(status, 0)}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,231 @@
+#!/usr/bin/env python3
+"""
+Shared-memory corpus for process pools that read training examples without
+pickling them.
+
+A SharedCorpus is one multiprocessing.shared_memory block laid out as
+
+    [count: uint64][offsets: uint64 x (count + 1)][records: UTF-8 JSON, back to back]
+
+Record i is the byte range offsets[i]:offsets[i + 1]. from_jsonl() copies the
+lines of JSONL files straight into the buffer without decoding them, and
+from_records() encodes in-memory examples (such as a merged example list)
+once. Workers attach by name and see the same pages. raw(i) is a zero-copy
+memoryview and record(i) decodes only that record.
+
+map_corpus() sends each worker index ranges only. Results come back per
+range, so a stage that returns scores, hashes or flags moves a few bytes per
+record across processes instead of two pickled dicts.
+
+    from shared_corpus import SharedCorpus, map_corpus
+    with SharedCorpus.from_jsonl("merged_training_data.jsonl") as corpus:
+        flags = map_corpus(corpus, has_plan, workers=8)
+
+Functions given to map_corpus() must be picklable top-level functions.
+
+Usage (benchmark against a pool that pickles each example):
+    python shared_corpus.py merged_training_data.jsonl --workers 1 2 4 8 --repeat 20
+"""
+import argparse
+import itertools
+import json
+import os
+import time
+import zlib
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import shared_memory
+
+import numpy as np
+
+from checkpoint import dedup_key
+from generate_merged_training import dedup_key_of, get_plan, get_plan_sections, read_jsonl
+
+HEADER_BYTES = 8
+
+
+class SharedCorpus:
+    """Records in one shared-memory block; the creating process owns (and unlinks) it."""
+
+    def __init__(self, shm, owner):
+        self.shm = shm
+        self.owner = owner
+        self.count = int(np.ndarray(1, np.uint64, shm.buf)[0])
+        self.offsets = np.ndarray(self.count + 1, np.uint64, shm.buf, HEADER_BYTES)
+        self.data_start = HEADER_BYTES + 8 * (self.count + 1)
+
+    @property
+    def name(self):
+        return self.shm.name
+
+    @classmethod
+    def _create(cls, lengths, fill):
+        """Allocate a block for records of the given byte lengths; fill(view) copies the records in."""
+        offsets = np.zeros(len(lengths) + 1, np.uint64)
+        np.cumsum(lengths, out=offsets[1:])
+        data_start = HEADER_BYTES + 8 * len(offsets)
+        shm = shared_memory.SharedMemory(create=True, size=max(data_start + int(offsets[-1]), 1))
+        np.ndarray(1, np.uint64, shm.buf)[0] = len(lengths)
+        np.ndarray(len(offsets), np.uint64, shm.buf, HEADER_BYTES)[:] = offsets
+        fill(shm.buf[data_start:data_start + int(offsets[-1])])
+        return cls(shm, owner=True)
+
+    @classmethod
+    def from_records(cls, records):
+        """Encode records once as compact JSON."""
+        encoded = [json.dumps(r, ensure_ascii=False, separators=(",", ":")).encode("utf-8") for r in records]
+        lengths = np.array([len(e) for e in encoded], np.uint64)
+
+        def fill(view):
+            view[:] = b"".join(encoded)
+
+        return cls._create(lengths, fill)
+
+    @classmethod
+    def from_jsonl(cls, *paths):
+        """Copy the non-blank lines of JSONL files in, without decoding them."""
+        chunks = []
+        for path in paths:
+            with open(path, "rb") as f:
+                data = f.read()
+            buf = np.frombuffer(data, np.uint8)
+            ends = np.flatnonzero(buf == ord("\n"))
+            if not data.endswith(b"\n"):
+                ends = np.append(ends, len(data))
+            starts = np.r_[0, ends[:-1] + 1]
+            keep = [(s, e) for s, e in zip(starts.tolist(), ends.tolist()) if data[s:e].strip()]
+            chunks.append((data, keep))
+        lengths = np.array([e - s for _, keep in chunks for s, e in keep], np.uint64)
+
+        def fill(view):
+            position = 0
+            for data, keep in chunks:
+                for s, e in keep:
+                    view[position:position + e - s] = data[s:e]
+                    position += e - s
+
+        return cls._create(lengths, fill)
+
+    @classmethod
+    def attach(cls, name):
+        try:
+            shm = shared_memory.SharedMemory(name=name, track=False)
+        except TypeError:  # Python < 3.13 has no track flag
+            shm = shared_memory.SharedMemory(name=name)
+        return cls(shm, owner=False)
+
+    def __len__(self):
+        return self.count
+
+    def raw(self, i):
+        """Zero-copy view of record i's UTF-8 JSON."""
+        return self.shm.buf[self.data_start + int(self.offsets[i]):self.data_start + int(self.offsets[i + 1])]
+
+    def record(self, i):
+        return json.loads(bytes(self.raw(i)))
+
+    def __iter__(self):
+        return (self.record(i) for i in range(self.count))
+
+    def close(self):
+        # Views into the block must be dropped before it can be closed.
+        self.offsets = None
+        self.shm.close()
+        if self.owner:
+            self.shm.unlink()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+_WORKER_CORPUS = None
+
+
+def _attach_worker(name):
+    global _WORKER_CORPUS
+    _WORKER_CORPUS = SharedCorpus.attach(name)
+
+
+def _map_range(fn, start, end, raw):
+    corpus = _WORKER_CORPUS
+    if raw:
+        return [fn(corpus.raw(i)) for i in range(start, end)]
+    return [fn(corpus.record(i)) for i in range(start, end)]
+
+
+def map_corpus(corpus, fn, workers=None, chunk_size=512, raw=False):
+    """[fn(record) for every record], in order, computed by workers attached to the corpus.
+
+    With raw=True fn gets the record's memoryview instead of the decoded dict.
+    """
+    workers = workers or os.cpu_count() or 1
+    ranges = [(start, min(start + chunk_size, len(corpus))) for start in range(0, len(corpus), chunk_size)]
+    if workers == 1 or len(ranges) <= 1:
+        get = corpus.raw if raw else corpus.record
+        return [fn(get(i)) for i in range(len(corpus))]
+
+    results = []
+    with ProcessPoolExecutor(max_workers=workers, initializer=_attach_worker, initargs=(corpus.name,)) as pool:
+        next_range = iter(ranges)
+        pending = [pool.submit(_map_range, fn, start, end, raw)
+                   for start, end in itertools.islice(next_range, workers * 2)]
+        while pending:
+            results.extend(pending.pop(0).result())
+            for start, end in itertools.islice(next_range, 1):
+                pending.append(pool.submit(_map_range, fn, start, end, raw))
+    return results
+
+
+def record_summary(example):
+    """Compact per-record result: (dedup hash, section count, question count, has plan)."""
+    sections = get_plan_sections(get_plan(example))
+    questions = sum(len(s.get("questions", [])) for s in sections)
+    return zlib.crc32(dedup_key(dedup_key_of(example)).encode("utf-8")), len(sections), questions, bool(sections)
+
+
+def record_hash(raw):
+    """CRC32 of a record's bytes, read in place (raw=True)."""
+    return zlib.crc32(raw)
+
+
+def _timed(fn, *args):
+    """(result, wall seconds, seconds of this process's CPU)."""
+    wall, cpu = time.perf_counter(), time.process_time()
+    result = fn(*args)
+    return result, time.perf_counter() - wall, time.process_time() - cpu
+
+
+def _pickled_map(fn, examples, workers, chunk_size):
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        return list(pool.map(fn, examples, chunksize=chunk_size))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark a shared-memory corpus against pickling examples.")
+    parser.add_argument("inputs", nargs="+")
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4, os.cpu_count() or 1])
+    parser.add_argument("--repeat", type=int, default=1, help="replicate the inputs to a bigger corpus")
+    parser.add_argument("--chunk-size", type=int, default=512)
+    args = parser.parse_args()
+
+    examples = [example for path in args.inputs for example in read_jsonl(path)] * args.repeat
+    started = time.perf_counter()
+    corpus = SharedCorpus.from_records(examples)
+    print(f"Shared {len(corpus)} records ({corpus.shm.size / 1e6:.1f} MB) "
+          f"in {time.perf_counter() - started:.2f}s as {corpus.name}")
+    with corpus:
+        expected = [record_summary(example) for example in examples]
+        for workers in args.workers:
+            pickled, pickled_wall, pickled_cpu = _timed(_pickled_map, record_summary, examples, workers,
+                                                        args.chunk_size)
+            shared, shared_wall, shared_cpu = _timed(map_corpus, corpus, record_summary, workers, args.chunk_size)
+            _, raw_wall, _ = _timed(map_corpus, corpus, record_hash, workers, args.chunk_size, True)
+            status = "ok" if pickled == shared == expected else "MISMATCH"
+            print(f"x{workers}: pickled dicts {len(examples) / pickled_wall:,.0f} rec/s "
+                  f"(parent CPU {pickled_cpu:.2f}s), shared {len(examples) / shared_wall:,.0f} rec/s "
+                  f"(parent CPU {shared_cpu:.2f}s), raw hash {len(examples) / raw_wall:,.0f} rec/s ({status})")
+
+if __name__ == "__main__":
+    main()
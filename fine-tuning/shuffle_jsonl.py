@@ -0,0 +1,117 @@
+#!/usr/bin/env python3
+"""
+Seeded global shuffle of a JSONL file larger than memory.
+
+The input is streamed once and each raw line is scattered into one of B
+temporary bucket files, choosing the bucket with a seeded RNG. The buckets
+are then read back one at a time, shuffled in memory and appended to the
+output. A uniform bucket choice followed by a uniform in-bucket shuffle is a
+uniform permutation of the whole file. B is chosen so an average bucket uses
+half the memory budget, but no more buckets are held open than the
+open-file limit allows: when the input needs more, or a bucket still
+exceeds the budget, that bucket is scattered again the same way before it
+is shuffled. A single record larger than the budget is an error. Lines are
+never decoded, and the same seed always gives the same order.
+
+Usage:
+    python shuffle_jsonl.py merged_training_data.jsonl -o merged_shuffled.jsonl --seed 13 --memory-mb 512
+"""
+import argparse
+import math
+import os
+import random
+import shutil
+import tempfile
+
+from checkpoint import atomic_write
+
+# Bucket files open at once in one scatter pass (each holds a 64 KiB write buffer).
+MAX_FANOUT = 1024
+
+
+def bucket_count(input_size, memory_bytes):
+    """Enough buckets that an average bucket uses about half the memory budget."""
+    return max(1, math.ceil(2 * input_size / max(memory_bytes, 1)))
+
+
+def max_fanout(reserve=64):
+    """Buckets one pass may open: MAX_FANOUT, or fewer under a low open-file limit."""
+    try:
+        import resource
+    except ImportError:  # not available on Windows
+        return MAX_FANOUT
+    soft, _ = resource.getrlimit(resource.RLIMIT_NOFILE)
+    if soft == resource.RLIM_INFINITY:
+        return MAX_FANOUT
+    return max(2, min(MAX_FANOUT, soft - reserve))
+
+
+def _lines(path):
+    with open(path, "rb") as f:
+        for line in f:
+            if line.strip():
+                yield line if line.endswith(b"\n") else line + b"\n"
+
+
+def _shuffle_part(out, path, size, count, name, seed, memory_bytes, fanout, work_dir, stats):
+    """Append a shuffled copy of path to out, scattering it into sub-buckets until each fits the budget."""
+    if size <= memory_bytes:
+        lines = list(_lines(path))
+        random.Random(f"{seed}:{name}").shuffle(lines)
+        out.writelines(lines)
+        stats["records"] += len(lines)
+        stats["buckets"] += 1
+        return
+    if count == 1:
+        raise ValueError(f"a {size}-byte record does not fit in the {memory_bytes}-byte memory budget")
+    buckets = max(2, min(fanout, bucket_count(size, memory_bytes)))
+    rng = random.Random(f"{seed}:{name}:scatter")
+    paths = [os.path.join(work_dir, f"bucket{name}-{i:04d}") for i in range(buckets)]
+    counts = [0] * buckets
+    handles = [open(part, "wb", buffering=1 << 16) for part in paths]
+    try:
+        for line in _lines(path):
+            i = rng.randrange(buckets)
+            handles[i].write(line)
+            counts[i] += 1
+    finally:
+        for handle in handles:
+            handle.close()
+    for i, part in enumerate(paths):
+        _shuffle_part(out, part, os.path.getsize(part), counts[i], f"{name}-{i:04d}", seed, memory_bytes, fanout,
+                      work_dir, stats)
+        os.remove(part)
+
+
+def shuffle_file(input_path, output_path, seed=0, memory_bytes=512 * 1024 * 1024, tmp_dir=None, fanout=None):
+    """Shuffle input_path into output_path; returns (records, buckets shuffled in memory)."""
+    work_dir = tempfile.mkdtemp(prefix="shuffle-", dir=tmp_dir or os.path.dirname(os.path.abspath(output_path)))
+    stats = {"records": 0, "buckets": 0}
+    try:
+        with atomic_write(output_path, "wb") as out:
+            _shuffle_part(out, input_path, os.path.getsize(input_path), None, "", seed, memory_bytes,
+                          fanout or max_fanout(), work_dir, stats)
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+    return stats["records"], stats["buckets"]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Out-of-core seeded shuffle of a JSONL file.")
+    parser.add_argument("input")
+    parser.add_argument("-o", "--output", required=True)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--memory-mb", type=float, default=512.0, help="memory budget for one bucket")
+    parser.add_argument("--tmp-dir", default=None, help="bucket directory (default: next to the output)")
+    args = parser.parse_args()
+
+    try:
+        records, buckets = shuffle_file(args.input, args.output, args.seed, int(args.memory_mb * 1024 * 1024),
+                                        args.tmp_dir)
+    except ValueError as e:
+        raise SystemExit(str(e))
+    print(f"Shuffled {records} records into {args.output} using {buckets} buckets")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,205 @@
+#!/usr/bin/env python3
+"""
+Local stand-in for an OpenAI-compatible /v1/chat/completions endpoint.
+Returns deterministic research plans shaped like response_format.json so the
+rollout and evaluation tools can be exercised without a real model.
+
+Chat-shaped requests ({"messages": [...]}) get chat completions, streamed as
+SSE deltas when "stream" is set. Planner-shaped requests ({"message": ...})
+mimic the ai-enhanced-planner edge function, streamed as NDJSON events.
+stub_batch_results() answers batch API request files offline.
+"""
+import argparse
+import hashlib
+import json
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+def stub_plan(user_msg):
+    """Build a deterministic plan for a request."""
+    request = user_msg.rsplit(":", 1)[-1].strip() or "Araştırma"
+    digest = hashlib.sha1(user_msg.encode("utf-8")).hexdigest()[:6]
+    return {
+        "chatResponse": f"{request} araştırma planını hazırladım. Soruları sağ panelde düzenleyebilirsiniz.",
+        "researchPlan": {
+            "title": f"{request} Araştırması",
+            "sections": [
+                {"id": f"experience_{digest}", "title": "Deneyim", "questions": [
+                    f"{request} konusundaki deneyiminizi anlatır mısınız?",
+                    "Bu süreçte en çok nerede zorlandınız?",
+                ]},
+                {"id": "improvements", "title": "İyileştirme Önerileri", "questions": [
+                    "Nelerin değişmesini istersiniz?",
+                ]},
+            ],
+        },
+    }
+
+
+def stub_batch_results(request_path, output_path, error_path=None, error_rate=0.0, invalid_rate=0.0, seed=0):
+    """Answer a batch request file offline, in the provider's output/error file format.
+
+    Lines come back in shuffled order, as real batch output does not keep
+    input order. Returns {"output": n, "errors": n}.
+    """
+    rng = random.Random(seed)
+    outputs, errors = [], []
+    with open(request_path, "r", encoding="utf-8") as f:
+        for n, line in enumerate(f):
+            if not line.strip():
+                continue
+            request = json.loads(line)
+            roll = rng.random()
+            entry = {"id": f"batch_req_{n:06d}", "custom_id": request["custom_id"]}
+            if roll < error_rate:
+                errors.append(dict(entry, response=None, error={"code": "server_error", "message": "stub overloaded"}))
+                continue
+            user_msg = ""
+            for msg in request["body"].get("messages", []):
+                if msg.get("role") == "user":
+                    user_msg = msg.get("content", "")
+            content = json.dumps(stub_plan(user_msg), ensure_ascii=False)
+            if roll < error_rate + invalid_rate:
+                content = content[: len(content) // 2]
+            body = {"id": f"chatcmpl-stub-{n}", "object": "chat.completion", "model": request["body"].get("model"),
+                    "choices": [{"index": 0, "finish_reason": "stop",
+                                 "message": {"role": "assistant", "content": content}}]}
+            outputs.append(dict(entry, response={"status_code": 200, "request_id": f"req_{n}", "body": body},
+                                error=None))
+    rng.shuffle(outputs)
+    if error_path is None:
+        outputs.extend(errors)
+    for path, lines in ((output_path, outputs), (error_path, errors)):
+        if path is not None:
+            with open(path, "w", encoding="utf-8") as out:
+                for entry in lines:
+                    out.write(json.dumps(entry, ensure_ascii=False) + "\n")
+    return {"output": len(outputs), "errors": len(errors)}
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, format, *args):
+        if self.server.verbose:
+            super().log_message(format, *args)
+
+    def _send_json(self, status, payload):
+        body = json.dumps(payload, ensure_ascii=False).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _send_chunked(self, content_type, chunks):
+        self.send_response(200)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Transfer-Encoding", "chunked")
+        self.end_headers()
+        for chunk in chunks:
+            data = chunk.encode("utf-8")
+            self.wfile.write(f"{len(data):x}\r\n".encode("ascii") + data + b"\r\n")
+            self.wfile.flush()
+            if self.server.chunk_delay:
+                time.sleep(self.server.chunk_delay)
+        self.wfile.write(b"0\r\n\r\n")
+
+    def do_POST(self):
+        length = int(self.headers.get("Content-Length", 0))
+        request = json.loads(self.rfile.read(length) or b"{}")
+        server = self.server
+        with server.lock:
+            roll = server.rng.random()
+            server.request_count += 1
+        if server.latency:
+            time.sleep(server.latency)
+        if roll < server.error_rate:
+            self._send_json(503, {"error": {"message": "stub overloaded"}})
+            return
+
+        planner = "messages" not in request
+        user_msg = request.get("message", "") if planner else ""
+        for msg in request.get("messages", []):
+            if msg.get("role") == "user":
+                user_msg = msg.get("content", "")
+        plan = stub_plan(user_msg)
+        content = json.dumps(plan, ensure_ascii=False)
+        if roll < server.error_rate + server.invalid_rate:
+            content = content[: len(content) // 2]
+        pieces = [content[i:i + 48] for i in range(0, len(content), 48)]
+
+        if planner:
+            final = {"reply": plan["chatResponse"], "contextReadiness": 100, "isReady": True,
+                     "brief": plan["researchPlan"]}
+            if not request.get("stream"):
+                self._send_json(200, final)
+                return
+            events = [{"event": "assistant_delta", "delta": piece} for piece in pieces]
+            events.append({"event": "final", "data": final})
+            self._send_chunked("application/x-ndjson; charset=utf-8",
+                               [json.dumps(e, ensure_ascii=False) + "\n" for e in events])
+        elif request.get("stream"):
+            events = [{"id": "chatcmpl-stub", "object": "chat.completion.chunk",
+                       "choices": [{"index": 0, "delta": {"content": piece}}]} for piece in pieces]
+            self._send_chunked("text/event-stream",
+                               [f"data: {json.dumps(e, ensure_ascii=False)}\n\n" for e in events] + ["data: [DONE]\n\n"])
+        else:
+            self._send_json(200, {
+                "id": "chatcmpl-stub",
+                "object": "chat.completion",
+                "model": request.get("model", "stub"),
+                "choices": [{"index": 0, "finish_reason": "stop",
+                             "message": {"role": "assistant", "content": content}}],
+            })
+
+
+def make_server(host="127.0.0.1", port=0, latency=0.0, error_rate=0.0, invalid_rate=0.0, seed=0,
+                chunk_delay=0.0, verbose=False):
+    """Create a stub server; port 0 picks a free port."""
+    server = ThreadingHTTPServer((host, port), StubHandler)
+    server.daemon_threads = True
+    server.latency = latency
+    server.error_rate = error_rate
+    server.invalid_rate = invalid_rate
+    server.chunk_delay = chunk_delay
+    server.rng = random.Random(seed)
+    server.lock = threading.Lock()
+    server.request_count = 0
+    server.verbose = verbose
+    return server
+
+
+def start_in_thread(**kwargs):
+    """Start a stub server in a daemon thread; returns (server, endpoint_url)."""
+    server = make_server(**kwargs)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    host, port = server.server_address[:2]
+    return server, f"http://{host}:{port}/v1/chat/completions"
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8089)
+    parser.add_argument("--latency", type=float, default=0.0, help="seconds to sleep per request")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="fraction of 503 responses")
+    parser.add_argument("--invalid-rate", type=float, default=0.0, help="fraction of truncated plans")
+    parser.add_argument("--chunk-delay", type=float, default=0.0, help="seconds between streamed chunks")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    server = make_server(args.host, args.port, args.latency, args.error_rate, args.invalid_rate, args.seed,
+                         args.chunk_delay, verbose=True)
+    print(f"Stub endpoint: http://{args.host}:{args.port}/v1/chat/completions")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,87 @@
+import json
+
+import pytest
+
+from batch_requests import build, compact_result, custom_id, reconcile
+from stub_llm_server import stub_batch_results
+
+REQUESTS = [f"Mobil uygulama deneyimi {i} araştırması" for i in range(40)]
+
+
+@pytest.fixture
+def sources(tmp_path):
+    path = tmp_path / "sources.jsonl"
+    with open(path, "w", encoding="utf-8") as f:
+        for request in REQUESTS + REQUESTS[:5]:  # repeated requests are sent once
+            f.write(json.dumps({"messages": [{"role": "user", "content": request}]}, ensure_ascii=False) + "\n")
+    return str(path)
+
+
+def read_lines(path):
+    with open(path, "r", encoding="utf-8") as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+def test_build_dedups_and_rolls_over(tmp_path, sources):
+    paths, written, duplicates = build([sources], str(tmp_path / "batch" / "requests"), "stub", 15, 190.0)
+    assert (written, duplicates) == (40, 5)
+    assert [len(read_lines(p)) for p in paths] == [15, 15, 10]
+    lines = [line for p in paths for line in read_lines(p)]
+    assert len({line["custom_id"] for line in lines}) == 40
+    assert all(line["body"]["response_format"]["type"] == "json_schema" for line in lines)
+
+
+@pytest.mark.parametrize("partitions", [1, 4])
+def test_reconcile_grades_missing_error_and_invalid(tmp_path, sources, partitions):
+    paths, _, _ = build([sources], str(tmp_path / "requests"), "stub", 20, 190.0)
+    results = []
+    for n, path in enumerate(paths):
+        output = str(tmp_path / f"results-{n}.jsonl")
+        stub_batch_results(path, output, error_rate=0.2, invalid_rate=0.2, seed=n)
+        results.append(output)
+    # Drop a few results entirely and add one for a request that was never sent.
+    lines = read_lines(results[0])
+    dropped = {line["custom_id"] for line in lines[:3]}
+    lines = lines[3:] + [dict(lines[3], custom_id=custom_id("başka bir istek"))]
+    with open(results[0], "w", encoding="utf-8") as f:
+        f.writelines(json.dumps(line, ensure_ascii=False) + "\n" for line in lines)
+
+    graded = str(tmp_path / "graded.jsonl")
+    stats = reconcile([sources], results, graded, "grade", partitions)
+    rows = read_lines(graded)
+    assert len(rows) == 40
+    assert {row["custom_id"] for row in rows if row["status"] == "missing"} == dropped
+    assert stats["unmatched"] == 1
+    for status in ("ok", "error", "invalid"):
+        assert stats[status] == sum(1 for row in rows if row["status"] == status) > 0
+    assert all(row["error"] == "stub overloaded" for row in rows if row["status"] == "error")
+    assert all(row["errors"] for row in rows if row["status"] == "invalid")
+
+    merged = str(tmp_path / "merged.jsonl")
+    reconcile([sources], results, merged, "merge", partitions)
+    examples = read_lines(merged)
+    assert len(examples) == stats["ok"]
+    assert all(example["messages"][-1]["role"] == "assistant" for example in examples)
+
+
+@pytest.mark.parametrize("result, expected", [
+    ({"custom_id": "a", "response": None, "error": "rate limited"}, "rate limited"),
+    ({"custom_id": "a", "response": None, "error": {"code": "x", "message": "boom"}}, "boom"),
+    ({"custom_id": "a", "response": {"status_code": 500, "body": None}, "error": None}, "HTTP 500"),
+    ({"custom_id": "a", "response": {"status_code": 429, "body": {"error": {"message": "slow down"}}},
+      "error": None}, "slow down"),
+    ({"custom_id": "a", "response": {"status_code": 400, "body": {"error": "bad body"}}, "error": None}, "bad body"),
+    ({"custom_id": "a", "response": {"status_code": None, "body": {"choices": []}}, "error": None},
+     "response without message content"),
+])
+def test_compact_result_errors(result, expected):
+    assert compact_result(json.dumps(result)) == ("a", {"error": expected})
+
+
+def test_reconcile_caps_partitions_at_the_open_file_limit(tmp_path, sources, low_file_limit):
+    paths, _, _ = build([sources], str(tmp_path / "requests"), "stub", 50, 190.0)
+    results = str(tmp_path / "results.jsonl")
+    stub_batch_results(paths[0], results)
+    stats = reconcile([sources], [results], str(tmp_path / "graded.jsonl"), "grade", 5000)
+    assert stats["partitions"] == 64
+    assert stats["ok"] == 40
@@ -0,0 +1,19 @@
+import json
+
+from build_preference_pairs import build_pairs
+
+
+def test_build_pairs_caps_partitions_at_the_open_file_limit(tmp_path, low_file_limit):
+    projects = [{"id": f"p{i}", "title": f"Proje {i}", "description": f"Proje {i} kullanıcı araştırması",
+                 "guide": {"title": f"Proje {i}", "sections": [{"id": "s", "title": "Deneyim",
+                                                                "questions": [f"Soru {i}?", "Başka?"]}]}}
+                for i in range(300)]
+    events = [{"project_id": f"p{i}", "research_mode": None, "section_title": "Deneyim", "section_index": 0,
+               "original_question_text": f"Soru {i}?", "edited_question_text": f"Yeni soru {i}?",
+               "edit_source": "user"} for i in range(300)]
+    output = tmp_path / "pairs.jsonl"
+    stats = build_pairs(events, projects, str(output), 5000)
+    assert stats["partitions"] == 64
+    assert stats["written"] == 300
+    assert len(output.read_text(encoding="utf-8").splitlines()) == 300
+    assert json.loads(output.read_text(encoding="utf-8").splitlines()[0])["preferred_output"]
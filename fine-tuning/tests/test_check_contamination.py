@@ -0,0 +1,47 @@
+import os
+
+import pytest
+
+from check_contamination import ContaminationIndex
+from generate_merged_training import get_user_message, read_jsonl
+
+TRAIN = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "rft_training_data_final.jsonl")
+REPORT_THRESHOLD = 0.5
+
+
+@pytest.fixture(scope="module")
+def index():
+    index = ContaminationIndex()
+    for example in read_jsonl(TRAIN):
+        index.add(get_user_message(example), TRAIN)
+    index.prune()
+    return index
+
+
+def best(index, text):
+    matches = index.score(text)
+    if not matches:
+        return 0.0, None
+    score, word, char, term, record_id = matches[0]
+    return score, index.texts[record_id]
+
+
+def test_paraphrase_is_reported(index):
+    score, train = best(index, "Kredi kartı limitini artırma akışını test etmemiz gerekiyor")
+    assert train.endswith("Kredi kartı limit artırma ve azaltma deneyimini araştıralım")
+    assert score >= REPORT_THRESHOLD
+
+
+@pytest.mark.parametrize("text", ["Müşteri deneyimi", "Mobil uygulama", "Araştırmak istiyoruz"])
+def test_short_generic_requests_are_not_reported(index, text):
+    assert best(index, text)[0] < REPORT_THRESHOLD
+
+
+def test_near_copy_fails_and_exact_copy_scores_one(index):
+    assert best(index, "Kredi kartı limit artırma ve azaltma deneyimini araştıralım artık")[0] >= 0.9
+    assert best(index, "kredi karti limit artirma ve azaltma deneyimini arastiralim")[0] == 1.0
+
+
+def test_requests_below_min_grams_score_nothing_in_that_channel(index):
+    for _, word, _, term, _ in index.score("Müşteri deneyimi"):
+        assert word == term == 0.0
@@ -0,0 +1,107 @@
+import argparse
+import asyncio
+import json
+import socket
+import threading
+
+import pytest
+
+import stub_llm_server
+from load_test_planner import PLANNER_FINAL_SCHEMA, load_test, planner_valid
+from plan_schema import schema_errors
+
+REQUESTS = ["Mobil bankacılık uygulaması", "Online market sepet terk", "Kargo takip deneyimi"]
+
+
+@pytest.fixture
+def inputs(tmp_path):
+    path = tmp_path / "eval.jsonl"
+    with open(path, "w", encoding="utf-8") as f:
+        for request in REQUESTS:
+            f.write(json.dumps({"messages": [{"role": "user", "content": request}]}, ensure_ascii=False) + "\n")
+    return str(path)
+
+
+@pytest.fixture
+def stub():
+    server, url = stub_llm_server.start_in_thread()
+    yield server, url
+    server.shutdown()
+
+
+def make_args(inputs, endpoint, payload, stream, qps=0.0):
+    return argparse.Namespace(
+        inputs=[inputs], endpoint=endpoint, payload=payload, model="stub", api_key="test", qps=qps,
+        concurrency=2, requests=6, max_inflight=8, stream=stream, timeout=10.0,
+    )
+
+
+@pytest.mark.parametrize("payload", ["chat", "planner"])
+@pytest.mark.parametrize("stream", [False, True])
+@pytest.mark.parametrize("qps", [0.0, 50.0])
+def test_stub_responses_are_valid(stub, inputs, payload, stream, qps):
+    server, url = stub
+    report = asyncio.run(load_test(make_args(inputs, url, payload, stream, qps)))
+    assert report["requests"] == 6
+    assert report["error_rate"] == 0.0
+    assert report["schema_valid_rate"] == 1.0
+    assert bool(report["ttfb_ms"]) == stream
+    assert server.request_count == 6
+
+
+def test_invalid_plans_are_counted(inputs):
+    server, url = stub_llm_server.start_in_thread(invalid_rate=1.0)
+    try:
+        report = asyncio.run(load_test(make_args(inputs, url, "chat", True)))
+    finally:
+        server.shutdown()
+    assert report["error_rate"] == 0.0
+    assert report["schema_valid_rate"] == 0.0
+
+
+def test_http_errors_are_counted(inputs):
+    server, url = stub_llm_server.start_in_thread(error_rate=1.0)
+    try:
+        report = asyncio.run(load_test(make_args(inputs, url, "chat", False)))
+    finally:
+        server.shutdown()
+    assert report["errors"] == {"HTTP 503": 6}
+
+
+def test_truncated_stream_is_one_error_not_an_abort(inputs):
+    listener = socket.socket()
+    listener.bind(("127.0.0.1", 0))
+    listener.listen()
+
+    def serve():
+        while True:
+            try:
+                conn, _ = listener.accept()
+            except OSError:
+                return
+            conn.recv(65536)
+            conn.sendall(b"HTTP/1.1 200 OK\r\nTransfer-Encoding: chunked\r\n\r\n40\r\n{\"event\"")
+            conn.close()
+
+    threading.Thread(target=serve, daemon=True).start()
+    url = "http://127.0.0.1:%d/" % listener.getsockname()[1]
+    try:
+        report = asyncio.run(load_test(make_args(inputs, url, "planner", True)))
+    finally:
+        listener.close()
+    assert report["requests"] == 6
+    assert report["errors"] == {"IncompleteReadError": 6}
+
+
+def test_planner_final_payload_must_match_the_schema():
+    final = {"reply": "Hazır.", "contextReadiness": 100, "isReady": True, "brief": {}}
+    assert not schema_errors(final, PLANNER_FINAL_SCHEMA)
+    assert planner_valid(json.dumps(final).encode("utf-8"), False)
+    for broken in ({**final, "reply": "  "}, {**final, "isReady": "yes"}, {k: v for k, v in final.items() if k != "brief"}):
+        assert not planner_valid(json.dumps(broken).encode("utf-8"), False)
+    streamed = [{"event": "assistant_delta", "delta": "Haz"}, {"event": "final", "data": final}]
+    assert planner_valid("".join(json.dumps(e) + "\n" for e in streamed).encode("utf-8"), True)
+    assert not planner_valid(json.dumps(streamed[0]).encode("utf-8"), True)
+    for stray in ([1, 2], "final"):
+        body = "".join(json.dumps(e) + "\n" for e in [stray] + streamed).encode("utf-8")
+        assert not planner_valid(body, True)
@@ -0,0 +1,64 @@
+import json
+
+import pytest
+
+from normalize_typos import MAGIC, TypoNormalizer, reference_words
+
+TRUSTED = ["görünüyor", "kullanıyor", "kullanıcı", "sepet", "yaşıyor", "istediğiniz", "ediyor", "şikayet",
+           "müşterilerin", "tercih"]
+
+
+@pytest.fixture
+def normalizer():
+    counts = {word: 5 for word in TRUSTED}
+    counts.update({"görünmüyor": 1, "kullanmıyor": 1, "senet": 1, "yarıyor": 1, "istediğimiz": 1, "etmiyor": 1})
+    return TypoNormalizer(counts, reference=set())
+
+
+@pytest.mark.parametrize("word", ["görünmüyor", "kullanmıyor", "etmiyor", "istediğimiz"])
+def test_negation_and_person_are_never_edited(normalizer, word):
+    assert normalizer.lookup(word) == word
+
+
+@pytest.mark.parametrize("word", ["senet", "yarıyor", "yariyor"])
+def test_substitutions_into_other_real_words_are_refused(normalizer, word):
+    assert normalizer.lookup(word) == word
+
+
+def test_sentences_keep_their_meaning(normalizer):
+    assert normalizer.correct("Müşteri bu ürünü tercih etmiyor") == "Müşteri bu ürünü tercih etmiyor"
+    assert normalizer.correct("ediyor veya etmiyor") == "ediyor veya etmiyor"
+
+
+def test_typos_and_missing_diacritics_are_still_corrected(normalizer):
+    assert normalizer.lookup("kullnıcı") == "kullanıcı"
+    assert normalizer.correct("Sikayet eden musterilerin") == "Şikayet eden müşterilerin"
+
+
+def test_words_seen_twice_or_in_the_reference_are_kept():
+    counts = {"sepet": 5, "senet": 2, "kullanıcı": 5}
+    assert TypoNormalizer(counts, reference=set()).lookup("senet") == "senet"
+    normalizer = TypoNormalizer({"kullanıcı": 5}, reference={"kullnıcı"})
+    assert normalizer.lookup("kullnıcı") == "kullnıcı"
+
+
+def test_default_reference_comes_from_the_lexicon():
+    assert "açıklama" in reference_words()
+
+
+def test_dictionary_round_trips_without_pickle(tmp_path):
+    source = tmp_path / "vocab.jsonl"
+    example = {"messages": [{"role": "system", "content": "s"}, {"role": "user", "content": "kullanıcı " * 3}]}
+    source.write_text(json.dumps(example, ensure_ascii=False) + "\n", encoding="utf-8")
+    path = str(tmp_path / "typos.json")
+
+    built = TypoNormalizer.load_or_build(path, [str(source)], reference=set(), min_count=1)
+    with open(path, "rb") as f:
+        assert f.readline() == MAGIC
+        json.loads(f.readline())
+        body = json.loads(f.read())
+    assert body["words"] == built.words
+
+    loaded = TypoNormalizer.load(path, [str(source)], reference=set(), min_count=1)
+    assert loaded.words == built.words and loaded.index == built.index
+    assert loaded.lookup("kullnıcı") == "kullanıcı"
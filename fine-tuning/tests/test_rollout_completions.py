@@ -0,0 +1,75 @@
+import argparse
+import asyncio
+import json
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+import stub_llm_server
+from rollout_completions import journal_path, rollout
+
+REQUESTS = [f"Mobil uygulama deneyimi {i}" for i in range(12)]
+
+
+class ErrorBodyHandler(BaseHTTPRequestHandler):
+    """Answers every request with 200 and a body that has no choices."""
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, format, *args):
+        pass
+
+    def do_POST(self):
+        self.rfile.read(int(self.headers.get("Content-Length", 0)))
+        body = json.dumps({"error": "x"}).encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+
+@pytest.fixture
+def inputs(tmp_path):
+    path = tmp_path / "prompts.jsonl"
+    with open(path, "w", encoding="utf-8") as f:
+        for request in REQUESTS:
+            f.write(json.dumps({"messages": [{"role": "user", "content": request}]}, ensure_ascii=False) + "\n")
+    return str(path)
+
+
+def make_args(inputs, output, endpoint, concurrency=3):
+    return argparse.Namespace(
+        inputs=[inputs], output=output, endpoint=endpoint, model="stub", api_key="test", concurrency=concurrency,
+        queue_size=2, max_retries=1, backoff=0.0, timeout=10.0, temperature=0.7, limit=0, stream=False,
+        max_sections=None, max_questions=None,
+    )
+
+
+def journal_statuses(output):
+    with open(journal_path(output), "r", encoding="utf-8") as f:
+        return [json.loads(line)["status"] for line in f]
+
+
+def test_rollout_completes_every_request(tmp_path, inputs):
+    server, url = stub_llm_server.start_in_thread()
+    output = str(tmp_path / "completed.jsonl")
+    try:
+        queued, stats = asyncio.run(asyncio.wait_for(rollout(make_args(inputs, output, url)), 30))
+    finally:
+        server.shutdown()
+    assert (queued, stats) == (12, {"ok": 12})
+
+
+def test_malformed_responses_are_counted_errors(tmp_path, inputs):
+    server = ThreadingHTTPServer(("127.0.0.1", 0), ErrorBodyHandler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    output = str(tmp_path / "completed.jsonl")
+    url = "http://127.0.0.1:%d/v1/chat/completions" % server.server_address[1]
+    try:
+        queued, stats = asyncio.run(asyncio.wait_for(rollout(make_args(inputs, output, url)), 30))
+    finally:
+        server.shutdown()
+    assert (queued, stats) == (12, {"error": 12})
+    assert journal_statuses(output) == ["error"] * 12
@@ -0,0 +1,42 @@
+import json
+import math
+
+import pytest
+
+from shuffle_jsonl import bucket_count, shuffle_file
+
+
+@pytest.fixture
+def records(tmp_path):
+    path = tmp_path / "input.jsonl"
+    lines = [json.dumps({"i": i, "text": "x" * (i % 50)}) + "\n" for i in range(2000)]
+    path.write_text("".join(lines[:1000]) + "\n" + "".join(lines[1000:]).rstrip("\n"), encoding="utf-8")
+    return path, lines
+
+
+def test_bucket_count_is_not_capped():
+    assert bucket_count(10 ** 12, 1024) == 1953125000
+
+
+@pytest.mark.parametrize("memory_bytes, fanout", [(1 << 20, 4), (8000, 1024), (8000, 3)])
+def test_shuffle_is_a_seeded_permutation(tmp_path, records, memory_bytes, fanout):
+    path, lines = records
+    first, second = tmp_path / "a.jsonl", tmp_path / "b.jsonl"
+    count, buckets = shuffle_file(str(path), str(first), 7, memory_bytes, fanout=fanout)
+    shuffle_file(str(path), str(second), 7, memory_bytes, fanout=fanout)
+    shuffled = first.read_text(encoding="utf-8").splitlines(keepends=True)
+    assert count == len(lines)
+    assert sorted(shuffled) == sorted(lines)
+    assert shuffled != lines
+    assert first.read_bytes() == second.read_bytes()
+    # Every bucket shuffled in memory fits the budget.
+    assert buckets >= math.ceil(path.stat().st_size / memory_bytes)
+    assert not [p for p in tmp_path.iterdir() if p.name.startswith("shuffle-")]
+
+
+def test_record_larger_than_the_budget_fails(tmp_path):
+    path = tmp_path / "input.jsonl"
+    path.write_text(json.dumps({"text": "x" * 5000}) + "\n" + json.dumps({"text": "y"}) + "\n", encoding="utf-8")
+    with pytest.raises(ValueError, match="memory budget"):
+        shuffle_file(str(path), str(tmp_path / "out.jsonl"), 0, 1000, fanout=4)
+    assert not (tmp_path / "out.jsonl").exists()
@@ -0,0 +1,31 @@
+-- Notify the fine-tuning ingester (fine-tuning/live_ingest.py) about new
+-- researcher feedback. Payloads only carry ids; the ingester fetches rows.
+create or replace function public.notify_training_feed()
+returns trigger
+language plpgsql
+as $$
+begin
+  perform pg_notify(
+    'training_feed',
+    json_build_object(
+      'table', TG_TABLE_NAME,
+      'id', new.id,
+      'project_id', new.project_id,
+      'created_at', new.created_at
+    )::text
+  );
+  return new;
+end;
+$$;
+
+drop trigger if exists notify_training_feed on public.question_edit_events;
+create trigger notify_training_feed
+after insert on public.question_edit_events
+for each row
+execute function public.notify_training_feed();
+
+drop trigger if exists notify_training_feed on public.interview_questions;
+create trigger notify_training_feed
+after insert on public.interview_questions
+for each row
+execute function public.notify_training_feed();